@@ -1,23 +1,16 @@
 from django.urls import path
 
-import csv
-import io
-from django.http import HttpResponse
 import requests
 from django.conf import settings
 from django.contrib import admin, messages
 from django.utils.html import format_html
-from django.db.models import Avg
+from django.db.models import Avg, Count
 from django.shortcuts import redirect
-
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+from django.urls import reverse
 
 from .models import Student, Lecturer, Assignment
+from .exports import streaming_csv_response
+from . import reports
 
 from django.contrib import admin
 from .models import Student, Lecturer, LecturerRating, Assignment
@@ -34,24 +27,33 @@ class StudentAdmin(admin.ModelAdmin):
     list_filter = ['department']
     inlines = [LecturerRatingInline]
     ordering = ['-gpa', 'id']
+
+    def get_queryset(self, request):
+        # Counted in the changelist query rather than once per row
+        return super().get_queryset(request).annotate(given_rating_count=Count('given_ratings'))
     
     def rating_count(self, obj):
-        return obj.given_ratings.count()
+        return obj.given_rating_count
     rating_count.short_description = "Ratings Given"
+    rating_count.admin_order_field = 'given_rating_count'
 
 class LecturerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'average_rating', 'rating_count', 'assignment_count']
+    list_display = ['id', 'user', 'average_rating', 'rating_count', 'capacity', 'assignment_count']
     search_fields = ['user__full_name']
     inlines = [LecturerRatingInline]
     ordering = ['-average_rating']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(assigned_count=Count('lecturer_assignments'))
     
     def rating_count(self, obj):
         return obj.rating_count
     rating_count.admin_order_field = 'rating_count'
     
     def assignment_count(self, obj):
-        return obj.lecturer_assignments.count()
+        return obj.assigned_count
     assignment_count.short_description = "Students Assigned"
+    assignment_count.admin_order_field = 'assigned_count'
 
 class LecturerRatingAdmin(admin.ModelAdmin):
     list_display = ['student', 'lecturer', 'rating', 'created_at']
@@ -71,50 +73,89 @@ class AssignmentAdmin(admin.ModelAdmin):
         urls = super().get_urls()
         custom_urls = [
             path('run-assignments/', self.admin_site.admin_view(self.run_assignments), name="run-assignments"),
+            path('reports/<str:key>/', self.admin_site.admin_view(self.download_report), name="assignment-report"),
         ]
         return custom_urls + urls
 
+    # Moves listed on the dry-run preview page; the counts always cover all of them
+    preview_limit = 200
+
     def run_assignments(self, request):
         from django.contrib import messages
-        from django.db.models import Avg
-        from .models import Student, Lecturer, Assignment
-
-        # Get students sorted by rank (assuming lower rank is better)
-        students = list(Student.objects.all().order_by('rank'))
-        # Get lecturers sorted by average rating (highest first)
-        lecturers = list(Lecturer.objects.annotate(avg_rating=Avg('ratings__rating')).order_by('-avg_rating'))
-        
-        if not lecturers:
-            self.message_user(request, "No lecturers available for assignment.", level=messages.ERROR)
+        from django.template.response import TemplateResponse
+        from .assignment import AssignmentError, run_assignments
+        from .serializers import RunAssignmentsSerializer
+
+        # GET only ever previews; applying a run writes, so it must be a POST
+        data = request.POST if request.method == 'POST' else request.GET
+        options = RunAssignmentsSerializer(data=data)
+        if not options.is_valid():
+            self.message_user(request, f"Invalid options: {options.errors}.", level=messages.ERROR)
+            return redirect("..")
+        strategy = options.validated_data['strategy']
+        dry_run = options.validated_data['dry_run']
+        if not dry_run and request.method != 'POST':
+            self.message_user(request, "Assignments can only be applied from the preview form.", level=messages.ERROR)
             return redirect("..")
-        
-        lecturer_count = len(lecturers)
-        for i, student in enumerate(students):
-            lecturer = lecturers[i % lecturer_count]
-            # Update or create the assignment for the student
-            Assignment.objects.update_or_create(
-                student=student,
-                defaults={'lecturer': lecturer}
-            )
-        self.message_user(request, "Round-Robin assignment executed successfully!", level=messages.SUCCESS)
+        try:
+            summary = run_assignments(**options.validated_data)
+        except AssignmentError as e:
+            self.message_user(request, f"{e}.", level=messages.ERROR)
+            return redirect("..")
+
+        label = {'optimal': "Optimal", 'stable': "Stable-matching"}.get(strategy, "Round-Robin")
+        if dry_run:
+            apply_options = [(name, value) for name, values in data.lists()
+                             if name not in ('dry_run', 'csrfmiddlewaretoken') for value in values]
+            context = {
+                **self.admin_site.each_context(request),
+                'opts': self.model._meta,
+                'title': f"{label} assignment preview",
+                'summary': summary,
+                'moves': self._describe_moves(summary['moves'][:self.preview_limit]),
+                'apply_options': apply_options,
+            }
+            return TemplateResponse(request, "admin/api/assignment_preview.html", context)
+
+        self.message_user(
+            request,
+            f"{label} assignment executed successfully! "
+            f"{summary['new']} new, {summary['moved']} moved, {summary['unchanged']} unchanged, "
+            f"{summary['unassigned']} left unassigned.",
+            level=messages.SUCCESS,
+        )
         return redirect("..")
+
+    def download_report(self, request, key):
+        if reports.is_ready(key):
+            return reports.file_response(key)
+        if reports.is_running(key):
+            self.message_user(request, "The PDF report is still being generated; try again shortly.",
+                              level=messages.WARNING)
+        else:
+            self.message_user(request, "That PDF report is no longer available; export it again.",
+                              level=messages.ERROR)
+        return redirect("admin:api_assignment_changelist")
+
+    def _describe_moves(self, moves):
+        """Attach student and lecturer names to the moves shown on the preview page."""
+        students = Student.objects.select_related('user').in_bulk([move['student'] for move in moves])
+        lecturer_ids = {move[key] for move in moves for key in ('from', 'to') if move[key] is not None}
+        lecturers = Lecturer.objects.select_related('user').in_bulk(lecturer_ids)
+        return [
+            {
+                'student': students.get(move['student']),
+                'from': lecturers.get(move['from']),
+                'to': lecturers.get(move['to']),
+            }
+            for move in moves
+        ]
     
     def export_as_csv(self, request, queryset):
         """
-        Export selected assignments as a CSV file.
+        Export selected assignments as a CSV file, streamed from one joined query.
         """
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="assignments.csv"'
-        writer = csv.writer(response)
-        # Write header row
-        writer.writerow(['Student', 'Lecturer', 'Assigned Date'])
-        # Loop through selected assignments and write rows
-        for assignment in queryset:
-            writer.writerow([
-                str(assignment.student),
-                str(assignment.lecturer),
-                assignment.assigned_date.strftime("%Y-%m-%d %H:%M:%S")
-            ])
+        response = streaming_csv_response(queryset)
         self.message_user(request, "CSV export successful!", level=messages.SUCCESS)
         return response
 
@@ -123,56 +164,22 @@ class AssignmentAdmin(admin.ModelAdmin):
     def export_as_pdf(self, request, queryset):
         """
         Export selected assignments as a PDF file with a table layout.
+        The report is built in the background; once built, the same
+        selection over unchanged data downloads straight away.
         """
-        # 1. Create an in-memory buffer
-        buffer = io.BytesIO()
-        
-        # 2. Set up the document
-        doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=50)
-        elements = []
-        
-        # 3. Add a title
-        styles = getSampleStyleSheet()
-        title = Paragraph("Assignments Report", styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 20))  # Spacer for some breathing room
-        
-        # 4. Build table data
-        data = [["Student", "Lecturer", "Assigned Date"]]
-        for assignment in queryset:
-            data.append([
-                str(assignment.student),
-                str(assignment.lecturer),
-                assignment.assigned_date.strftime("%Y-%m-%d %H:%M:%S")
-            ])
-        
-        # 5. Create the table
-        # Adjust colWidths to prevent text overlap
-        table = Table(data, colWidths=[150, 150, 150])  
-        
-        # 6. Style the table
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),       # Header background
-            ('TEXTCOLOR',   (0, 0), (-1, 0), colors.whitesmoke),# Header text color
-            ('ALIGN',       (0, 0), (-1, -1), 'LEFT'),          # Align text to left
-            ('GRID',        (0, 0), (-1, -1), 1, colors.black), # Grid lines
-            ('FONTNAME',    (0, 0), (-1, 0), 'Helvetica-Bold'), # Header font
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),             # Extra space in header
-        ])
-        table.setStyle(style)
-        
-        # 7. Add the table to the document
-        elements.append(table)
-        
-        # 8. Build the PDF
-        doc.build(elements)
-        
-        # 9. Return the PDF as an HTTP response
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="assignments.pdf"'
-        self.message_user(request, "PDF export successful!", level=20)  # 20 = messages.SUCCESS
-        return response
+        key = reports.report_key(queryset)
+        if reports.is_ready(key):
+            return reports.file_response(key)
+        reports.start(key, queryset)
+        self.message_user(
+            request,
+            format_html(
+                'The PDF report is being generated in the background. '
+                '<a href="{}">Download it</a> once it is ready.',
+                reverse('admin:assignment-report', args=[key]),
+            ),
+            level=messages.INFO,
+        )
 
     export_as_pdf.short_description = "Export selected assignments as PDF"
 
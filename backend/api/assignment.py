@@ -0,0 +1,469 @@
+"""
+Supervisor assignment engine.
+
+A run reads students and lecturers as plain id arrays, computes the whole
+student -> lecturer mapping in memory with one of the ``STRATEGIES`` and then
+writes it back with batched upserts inside one transaction. The solve runs
+between the read and the write with no transaction open, so a long solve
+(or a pool of worker processes) never holds one. Rows whose lecturer did
+not change are not written at all, so a re-run over an unchanged table
+costs three reads. An incremental run only reads and writes the students
+that have no assignment yet.
+"""
+import heapq
+import math
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import matching, versions
+from .models import Assignment, Lecturer, LecturerRating, Student
+from .workers import process_pool, worker_count
+
+WRITE_BATCH_SIZE = 5000
+
+# Ratings and averages are compared as integers in hundredths of a point
+RATING_SCALE = 100
+
+# The optimal strategy's rank/rating affinity: students are split into
+# RANK_BANDS bands by rank, and the best-ranked band values a lecturer's
+# average rating RANK_AFFINITY (a quarter) more than the worst-ranked one
+# does, so better-ranked students are steered to better-rated lecturers when
+# their own ratings do not decide. Student values are multiplied by
+# VALUE_WEIGHT so the affinity stays in integers.
+RANK_BANDS = 10
+RANK_AFFINITY = 0.25
+VALUE_WEIGHT = round((RANK_BANDS - 1) / RANK_AFFINITY)
+
+
+class AssignmentError(Exception):
+    """Raised when an assignment run cannot be carried out."""
+
+
+def load_students(only_unassigned=False):
+    """
+    Return ``(student_ids, departments, current)``.
+
+    ``student_ids`` lists every student in rank order (best first),
+    ``departments`` holds each one's department at the same position and
+    ``current`` maps each already-assigned student id to its lecturer id;
+    all three come from a single LEFT JOIN query. With ``only_unassigned``
+    just the students without an assignment are returned, and ``current``
+    is empty.
+    """
+    students = Student.objects.all()
+    if only_unassigned:
+        students = students.filter(student_assignments__isnull=True)
+    rows = students.order_by('rank', 'id').values_list(
+        'id', 'department', 'student_assignments__lecturer_id'
+    )
+    student_ids = []
+    departments = []
+    current = {}
+    for student_id, department, lecturer_id in rows.iterator(chunk_size=5000):
+        student_ids.append(student_id)
+        departments.append(department)
+        if lecturer_id is not None:
+            current[student_id] = lecturer_id
+    return student_ids, departments, current
+
+
+def load_current(student_ids=None):
+    """
+    Return ``{student_id: lecturer_id}`` for the current assignments, of
+    just ``student_ids`` (read in batches) when given.
+    """
+    rows = Assignment.objects.values_list('student_id', 'lecturer_id')
+    if student_ids is None:
+        return dict(rows.iterator(chunk_size=5000))
+    current = {}
+    for start in range(0, len(student_ids), WRITE_BATCH_SIZE):
+        current.update(rows.filter(student_id__in=student_ids[start:start + WRITE_BATCH_SIZE]))
+    return current
+
+
+def load_lecturers(with_load=False):
+    """
+    Return ``(id, average_rating, capacity, department)`` rows ordered
+    best-rated first. A lecturer's department is the one on their user.
+    With ``with_load`` each row also carries ``load``, the number of
+    students currently assigned to the lecturer, counted by the database.
+
+    Lecturers nobody has rated yet sit at 0, and ties are broken by id so
+    repeated runs over the same data give the same result.
+    """
+    lecturers = Lecturer.objects.annotate(department=F('user__department'))
+    fields = ['id', 'average_rating', 'capacity', 'department']
+    if with_load:
+        lecturers = lecturers.annotate(load=Count('lecturer_assignments'))
+        fields.append('load')
+    return list(lecturers.order_by('-average_rating', 'id').values_list(*fields, named=True))
+
+
+def load_ratings():
+    """Return ``{student_id: [(lecturer_id, rating), ...]}`` for every rating given."""
+    ratings = {}
+    rows = LecturerRating.objects.values_list('student_id', 'lecturer_id', 'rating')
+    for student_id, lecturer_id, rating in rows.iterator(chunk_size=5000):
+        ratings.setdefault(student_id, []).append((lecturer_id, rating))
+    return ratings
+
+
+def _load(lecturer):
+    return getattr(lecturer, 'load', 0)
+
+
+def lecturer_capacities(lecturers, student_count):
+    """
+    Each lecturer's free places. Lecturers without a capacity split the
+    students the explicit capacities leave over evenly between them.
+
+    Rows loaded ``with_load`` count the students lecturers already have
+    against their capacity, and the even share is taken over those students
+    plus the ``student_count`` being placed.
+    """
+    total = student_count + sum(_load(lecturer) for lecturer in lecturers)
+    fixed = sum(lecturer.capacity for lecturer in lecturers if lecturer.capacity is not None)
+    flexible = sum(1 for lecturer in lecturers if lecturer.capacity is None)
+    even_share = math.ceil(max(total - fixed, 0) / flexible) if flexible else 0
+    return [
+        max((even_share if lecturer.capacity is None else lecturer.capacity) - _load(lecturer), 0)
+        for lecturer in lecturers
+    ]
+
+
+def round_robin(student_ids, lecturer_ids, loads=None):
+    """
+    Deal students out to lecturers in successive rounds: the best student
+    goes to the top-rated lecturer, the next to the second, and so on.
+
+    Given the lecturers' current ``loads`` the rotation carries on from
+    where it stopped: each student goes to the least-loaded lecturer, the
+    better-rated one on a tie, which is exactly the lecturer a full run
+    would have dealt to next.
+    """
+    lecturer_count = len(lecturer_ids)
+    if loads is None:
+        return {
+            student_id: lecturer_ids[i % lecturer_count]
+            for i, student_id in enumerate(student_ids)
+        }
+
+    queue = [(load, position) for position, load in enumerate(loads)]
+    heapq.heapify(queue)
+    mapping = {}
+    for student_id in student_ids:
+        load, position = queue[0]
+        mapping[student_id] = lecturer_ids[position]
+        heapq.heapreplace(queue, (load + 1, position))
+    return mapping
+
+
+def assign_round_robin(student_ids, lecturers, ratings=None):
+    lecturer_ids = [lecturer.id for lecturer in lecturers]
+    loads = [lecturer.load for lecturer in lecturers] if lecturers and hasattr(lecturers[0], 'load') else None
+    return round_robin(student_ids, lecturer_ids, loads), {}
+
+
+def _preference_arrays(student_ids, lecturers, ratings):
+    """
+    Build the integer inputs shared by the capacity-aware strategies.
+
+    Returns ``(capacities, placed, quality, pref_start, pref_lecturer,
+    pref_value)``. ``placed`` are the best-ranked students that fit in the
+    available places; everyone after them is left out. Preferences are in
+    CSR layout over lecturer indices (see :mod:`api.matching`), each
+    student's segment sorted best first, held in compact ``array``\ s so
+    hundreds of thousands of ratings stay small in memory.
+    """
+    capacities = lecturer_capacities(lecturers, len(student_ids))
+    placed = student_ids[:sum(capacities)]
+    index = {lecturer.id: j for j, lecturer in enumerate(lecturers)}
+
+    pref_start, pref_lecturer, pref_value = array('i', [0]), array('i'), array('i')
+    for student_id in placed:
+        given = sorted(
+            (-rating, index[lecturer_id])
+            for lecturer_id, rating in ratings.get(student_id, ())
+            if lecturer_id in index
+        )
+        for negated_rating, j in given:
+            pref_lecturer.append(j)
+            pref_value.append(-negated_rating * RATING_SCALE)
+        pref_start.append(len(pref_lecturer))
+    quality = [int(lecturer.average_rating * RATING_SCALE) for lecturer in lecturers]
+    return capacities, placed, quality, pref_start, pref_lecturer, pref_value
+
+
+def _mapping(placed, owner, lecturers):
+    return {
+        student_id: lecturers[j].id
+        for student_id, j in zip(placed, owner)
+        if j != matching.UNASSIGNED
+    }
+
+
+def rank_bands(count):
+    """The rank band of each of ``count`` students in rank order, 0 (best) to RANK_BANDS - 1."""
+    return array('b', (position * RANK_BANDS // count for position in range(count)))
+
+
+def assign_optimal(student_ids, lecturers, ratings):
+    """
+    Capacity-aware assignment that maximises how much students value their
+    supervisor: a student's own rating of a lecturer when they gave one,
+    otherwise the lecturer's average rating, plus a rank/rating affinity
+    (see RANK_AFFINITY) that pairs better-ranked students with better-rated
+    lecturers. When there are fewer places than students, the best-ranked
+    students are placed and the rest left out.
+
+    See :func:`api.matching.auction` for the algorithm and its complexity.
+    """
+    capacities, placed, quality, pref_start, pref_lecturer, pref_value = _preference_arrays(student_ids, lecturers, ratings)
+    owner, stats = matching.auction(
+        capacities,
+        [value * VALUE_WEIGHT for value in quality],
+        pref_start, pref_lecturer,
+        array('i', (value * VALUE_WEIGHT for value in pref_value)),
+        # The same precision as before the values were weighted: a hundredth of a point per student
+        epsilon=VALUE_WEIGHT,
+        time_budget=settings.ASSIGNMENT_TIME_BUDGET,
+        band=rank_bands(len(placed)),
+        band_weight=[RANK_BANDS - 1 - band for band in range(RANK_BANDS)],
+        affinity=quality,
+    )
+    return _mapping(placed, owner, lecturers), stats
+
+
+def assign_stable(student_ids, lecturers, ratings):
+    """
+    Stable matching: students propose down their own ratings (falling back to
+    average ratings for lecturers they did not rate) and lecturers keep the
+    best-ranked students that fit their capacity.
+
+    See :func:`api.matching.deferred_acceptance`.
+    """
+    capacities, placed, quality, pref_start, pref_lecturer, pref_value = _preference_arrays(student_ids, lecturers, ratings)
+    owner, stats = matching.deferred_acceptance(capacities, quality, pref_start, pref_lecturer, pref_value)
+    return _mapping(placed, owner, lecturers), stats
+
+
+# Strategy name -> function(student_ids, lecturers, ratings) returning
+# (mapping, solver stats). Strategies never touch the database, so they can
+# run in worker processes.
+STRATEGIES = {
+    'round_robin': assign_round_robin,
+    'optimal': assign_optimal,
+    'stable': assign_stable,
+}
+
+# Strategies that read students' ratings of lecturers
+RATING_STRATEGIES = {'optimal', 'stable'}
+
+
+def partition_by_department(student_ids, departments, lecturers):
+    """
+    Split a run into independent per-department problems.
+
+    Students are matched with the lecturers of their own department (taken
+    from the lecturer's user). Students of departments without lecturers of
+    their own share the lecturers that have no department. Returns a list of
+    ``(department, student_ids, lecturers)``, largest first; the shared
+    partition has department ``None``.
+    """
+    own = {}
+    shared = []
+    for lecturer in lecturers:
+        if lecturer.department:
+            own.setdefault(lecturer.department, []).append(lecturer)
+        else:
+            shared.append(lecturer)
+
+    students = {}
+    for student_id, department in zip(student_ids, departments):
+        students.setdefault(department if department in own else None, []).append(student_id)
+
+    partitions = [
+        (department, ids, own[department] if department is not None else shared)
+        for department, ids in students.items()
+    ]
+    partitions.sort(key=lambda partition: len(partition[1]), reverse=True)
+    return partitions
+
+
+def _solve_partition(strategy, student_ids, lecturers, ratings):
+    if not lecturers:
+        return {}, {}
+    return STRATEGIES[strategy](student_ids, lecturers, ratings)
+
+
+def solve_partitions(strategy, partitions, ratings):
+    """
+    Solve every partition with ``strategy``, one worker process each, and
+    merge the results.
+
+    Workers receive only their partition's ids and ratings and never query
+    the database. Call it with no transaction open: a forked worker would
+    inherit the open connection. Inside an atomic block the partitions are
+    solved in this process instead. Returns ``(mapping, stats)``.
+    """
+    jobs = [
+        (strategy, ids, partition_lecturers,
+         {student_id: ratings[student_id] for student_id in ids if student_id in ratings})
+        for _, ids, partition_lecturers in partitions
+    ]
+    workers = worker_count(settings.ASSIGNMENT_WORKERS, len(jobs))
+    if transaction.get_connection().in_atomic_block:
+        workers = 1
+    if workers == 1:
+        results = [_solve_partition(*job) for job in jobs]
+    else:
+        with process_pool(workers) as pool:
+            results = list(pool.map(_solve_partition, *zip(*jobs)))
+
+    mapping = {}
+    partition_stats = []
+    for (department, ids, partition_lecturers), (partial, stats) in zip(partitions, results):
+        mapping.update(partial)
+        partition_stats.append({
+            "department": department,
+            "students": len(ids),
+            "lecturers": len(partition_lecturers),
+            "assigned": len(partial),
+            **stats,
+        })
+    return mapping, {"workers": workers, "partitions": partition_stats}
+
+
+def diff_assignments(mapping, current):
+    """
+    Compare a proposed ``mapping`` with the ``current`` assignments.
+
+    Returns counts of new, moved, unchanged and removed students plus the
+    list of moves as ``{"student", "from", "to"}`` dicts; a removed student
+    moves to ``None``.
+    """
+    new = unchanged = 0
+    moves = []
+    for student_id, lecturer_id in mapping.items():
+        previous = current.get(student_id)
+        if previous is None:
+            new += 1
+        elif previous == lecturer_id:
+            unchanged += 1
+        else:
+            moves.append({"student": student_id, "from": previous, "to": lecturer_id})
+    moved = len(moves)
+    moves.extend(
+        {"student": student_id, "from": previous, "to": None}
+        for student_id, previous in current.items()
+        if student_id not in mapping
+    )
+    return {
+        "new": new,
+        "moved": moved,
+        "unchanged": unchanged,
+        "removed": len(moves) - moved,
+        "moves": moves,
+    }
+
+
+def write_assignments(mapping, current):
+    """
+    Upsert the rows of ``mapping`` that differ from ``current`` and delete the
+    assignments of students the mapping leaves out. Must run inside a
+    transaction.
+    """
+    rows = [
+        Assignment(student_id=student_id, lecturer_id=lecturer_id)
+        for student_id, lecturer_id in mapping.items()
+        if current.get(student_id) != lecturer_id
+    ]
+    Assignment.objects.bulk_create(
+        rows,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=['lecturer'],
+    )
+
+    dropped = [student_id for student_id in current if student_id not in mapping]
+    for start in range(0, len(dropped), WRITE_BATCH_SIZE):
+        Assignment.objects.filter(student_id__in=dropped[start:start + WRITE_BATCH_SIZE]).delete()
+
+
+def run_assignments(strategy='round_robin', by_department=False, dry_run=False, only_unassigned=False):
+    """
+    Assign students to lecturers with the named strategy and return a summary.
+
+    With ``by_department`` every department is solved on its own (see
+    :func:`partition_by_department`) in a pool of worker processes and the
+    results are written back together.
+
+    With ``dry_run`` nothing is written: the proposed mapping is only
+    compared with the current assignments and the summary carries the full
+    list of ``moves``. Apart from ratings for the strategies that use them,
+    a dry run costs two bulk reads.
+
+    With ``only_unassigned`` the run is incremental: only students without
+    an assignment are read and placed, existing assignments are left as
+    they are, and lecturers' current loads (counted in the database) decide
+    where the round-robin rotation continues and how many places the
+    capacity-aware strategies have left. Only the new rows are written.
+
+    The inputs are read in one transaction and the result written in
+    another; the solve in between holds no transaction. The write re-reads
+    the current assignments under that transaction, so anything assigned
+    while the solve ran is compared (or, for an incremental run, left
+    alone) rather than written over blindly.
+    """
+    if strategy not in STRATEGIES:
+        raise AssignmentError(f"Unknown strategy {strategy!r}; choose from {', '.join(STRATEGIES)}")
+
+    with transaction.atomic():
+        student_ids, departments, current = load_students(only_unassigned)
+        lecturers = load_lecturers(with_load=only_unassigned)
+        if not lecturers:
+            raise AssignmentError("No lecturers available for assignment")
+        ratings = load_ratings() if strategy in RATING_STRATEGIES else {}
+
+    if by_department:
+        partitions = partition_by_department(student_ids, departments, lecturers)
+        mapping, stats = solve_partitions(strategy, partitions, ratings)
+    else:
+        mapping, stats = STRATEGIES[strategy](student_ids, lecturers, ratings)
+
+    if dry_run:
+        diff = diff_assignments(mapping, current)
+    else:
+        with transaction.atomic():
+            if only_unassigned:
+                taken = load_current(list(mapping))
+                mapping = {student_id: lecturer_id for student_id, lecturer_id in mapping.items()
+                           if student_id not in taken}
+            else:
+                current = load_current()
+            diff = diff_assignments(mapping, current)
+            write_assignments(mapping, current)
+            if diff["new"] or diff["moved"] or diff["removed"]:
+                versions.bump(versions.ASSIGNMENTS)
+
+    moves = diff.pop("moves")
+    summary = {
+        "strategy": strategy,
+        "by_department": by_department,
+        "dry_run": dry_run,
+        "only_unassigned": only_unassigned,
+        "students": len(student_ids),
+        "lecturers": len(lecturers),
+        "assigned": len(mapping),
+        "unassigned": len(student_ids) - len(mapping),
+        **diff,
+    }
+    if stats:
+        summary["solver"] = stats
+    if dry_run:
+        summary["moves"] = moves
+    return summary
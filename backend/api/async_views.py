@@ -0,0 +1,157 @@
+"""
+Async versions of the hot read endpoints, for the ASGI deployment.
+
+Under uvicorn (``uvicorn backend.asgi:application``) these views wait on
+the database with Django's async ORM (``afirst``, ``async for``) instead
+of holding a worker thread for the length of each query. They are plain
+Django views rather than DRF ones, since DRF views are synchronous, but
+answer with the same JSON, pagination links, ETags and 304s as their
+synchronous counterparts in api.views; the URLs are the same ones under
+``async/``.
+
+Tokens are authenticated like ClaimsJWTAuthentication, without a query,
+and every endpoint requires an authenticated user, as the sync ones do.
+Serializers only ever see rows loaded in full (``select_related`` and the
+has_rated annotation), so serializing needs no further queries.
+"""
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from userauths.authentication import ClaimsJWTAuthentication
+
+from . import cache as api_cache
+from . import versions
+from .models import Assignment, Lecturer, Student
+from .pagination import KeysetPagination
+from .serializers import LecturerSerializer, StudentSerializer
+from .views import ConditionalGetMixin, HasRatedMixin
+
+
+class AsyncReadView(ConditionalGetMixin, View):
+    """
+    Base of the async read views: authenticates the request, answers
+    conditional GETs from the version counters, then returns what
+    get_response() builds.
+    """
+    authentication_class = ClaimsJWTAuthentication
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            await self.authenticate(request)
+        except exceptions.APIException as e:
+            return self.error_response(e)
+
+        resources = self.get_conditional_resources()
+        if resources:
+            self.resource_versions = await versions.acurrent(resources)
+            etag = self.get_etag(request, self.resource_versions)
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return self.add_etag(response, etag)
+        try:
+            response = await self.get_response(request, *args, **kwargs)
+        except exceptions.APIException as e:
+            return self.error_response(e)
+        if resources:
+            response = self.add_etag(response, etag)
+        return response
+
+    async def authenticate(self, request):
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+    def error_response(self, exc):
+        data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+        response = JsonResponse(data, status=exc.status_code)
+        if exc.status_code == 401:
+            response['WWW-Authenticate'] = self.authentication_class().authenticate_header(None)
+        return response
+
+    async def get_response(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def paginate(self, queryset, request):
+        """Read one keyset page of ``queryset``; returns the rows and the paginator holding the links."""
+        paginator = KeysetPagination()
+        rows = await paginator.apaginate_queryset(queryset, Request(request), view=self)
+        return rows, paginator
+
+
+class AsyncStudentListView(HasRatedMixin, AsyncReadView):
+    """Async StudentListView: students in department and rank order, optionally with has_rated."""
+    keyset_ordering = ('department', 'rank', 'id')
+
+    def get_lecturer_id(self):
+        try:
+            return int(self.request.GET['lecturer_id'])
+        except (KeyError, ValueError):
+            return None
+
+    def get_conditional_resources(self):
+        if self.get_lecturer_id() is None:
+            return (versions.STUDENTS,)
+        return (versions.STUDENTS, versions.RATINGS)
+
+    async def get_response(self, request, *args, **kwargs):
+        students = self.annotate_has_rated(Student.objects.select_related('user'))
+        rows, paginator = await self.paginate(students, request)
+        data = StudentSerializer(rows, many=True, context={'lecturer_id': self.get_lecturer_id()}).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+class AsyncLecturerListView(AsyncReadView):
+    """Async LecturerListView: lecturers from the best rated down, through the response cache."""
+    keyset_ordering = ('-average_rating', 'id')
+    conditional_resources = (versions.LECTURERS,)
+
+    async def get_response(self, request, *args, **kwargs):
+        async def build():
+            rows, paginator = await self.paginate(Lecturer.objects.select_related('user'), request)
+            return paginator.get_paginated_response(LecturerSerializer(rows, many=True).data).data
+
+        # Pages are cached by URL, so apart from the sync view's but under the same version
+        data = await api_cache.acached(
+            api_cache.LECTURER_LIST,
+            api_cache.lecturer_list_key(request, self.resource_versions[versions.LECTURERS]),
+            build,
+        )
+        return JsonResponse(data)
+
+
+class AsyncSupervisorAssignedToStudentView(AsyncReadView):
+    """Async SupervisorAssignedToStudentView: the lecturer a student is assigned to, in one query."""
+
+    async def get_response(self, request, student_id, *args, **kwargs):
+        assignment = await (
+            Assignment.objects.filter(student_id=student_id).select_related('lecturer__user').order_by('pk').afirst()
+        )
+        if assignment is None:
+            return JsonResponse({"error": "No supervisor found for this student"}, status=404)
+        return JsonResponse({"student_id": student_id, "supervisor": LecturerSerializer(assignment.lecturer).data})
+
+
+class AsyncStudentsAssignedToLecturerView(HasRatedMixin, AsyncReadView):
+    """Async StudentsAssignedToLecturerView: a lecturer's students, a page at a time, with has_rated."""
+    keyset_ordering = ('department', 'rank', 'id')
+    conditional_resources = (versions.ASSIGNMENTS, versions.STUDENTS, versions.RATINGS)
+
+    def get_lecturer_id(self):
+        return self.kwargs['lecturer_id']
+
+    async def get_response(self, request, lecturer_id, *args, **kwargs):
+        students = Student.objects.filter(student_assignments__lecturer_id=lecturer_id).select_related('user')
+        rows, paginator = await self.paginate(self.annotate_has_rated(students), request)
+        data = StudentSerializer(rows, many=True, context={'lecturer_id': lecturer_id}).data
+        return JsonResponse({
+            "lecturer_id": lecturer_id,
+            "students": data,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        })
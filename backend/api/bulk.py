@@ -0,0 +1,48 @@
+"""
+Shared plumbing of the bulk imports (:mod:`api.gpa_import` and
+:mod:`api.user_import`): the input formats, how a format is picked from a
+file name or a request's content type, and reading parsed rows in chunks.
+"""
+from pathlib import Path
+
+FORMATS = ('csv', 'ndjson')
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/x-jsonlines': 'ndjson',
+}
+
+SUFFIXES = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Cap on the number of row errors reported back; the total is always returned
+MAX_REPORTED_ERRORS = 100
+
+
+def format_for_path(path):
+    """The format of the file at ``path`` from its extension, or None."""
+    return SUFFIXES.get(Path(path).suffix.lower())
+
+
+def format_for_content_type(content_type):
+    """The format of a request body sent as ``content_type``, or None."""
+    return CONTENT_TYPES.get(content_type.split(';')[0].strip())
+
+
+def chunks(rows, size):
+    """Yield lists of up to ``size`` items from the iterable ``rows``."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,102 @@
+"""
+Response cache for the lecturer endpoints.
+
+Lecturers are read far more often than they are rated, so the serialized
+detail of each lecturer and every page of the lecturer list are kept in
+Django's cache (``settings.CACHES``; local memory unless ``CACHE_URL``
+points at Redis). Every key carries a version counter from the database
+(see :mod:`api.versions`), which the views have already read for their
+ETag: list pages the counter of all lecturers, and each lecturer's detail
+that lecturer's own counter, so rating one lecturer leaves the others'
+details cached. Nothing is ever deleted: a change bumps the counter, and
+from then on every process looks under new keys. A request that read the
+counter before a write and caches what it read stores it under the old
+version, which nobody asks for again, so a stale response cannot be cached
+past the change. Entries under old versions expire after
+``API_CACHE_TIMEOUT``.
+
+Hits and misses are counted in the cache itself and reported by
+:func:`stats`.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'api'
+
+LECTURER_DETAIL = 'lecturer_detail'
+LECTURER_LIST = 'lecturer_list'
+KINDS = (LECTURER_DETAIL, LECTURER_LIST)
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # missing or evicted
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+async def _aincr(key, delta=1):
+    try:
+        return await cache.aincr(key, delta)
+    except ValueError:  # missing or evicted
+        await cache.aadd(key, 0, timeout=None)
+        return await cache.aincr(key, delta)
+
+
+def lecturer_detail_key(pk, version):
+    return f'{PREFIX}:{LECTURER_DETAIL}:v{version}:{pk}'
+
+
+def lecturer_list_key(request, version):
+    """Key of a list page: the full URL (cursor and page size included) under ``version``."""
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'{PREFIX}:{LECTURER_LIST}:v{version}:{url}'
+
+
+def cached(kind, key, build):
+    """
+    Return the value cached under ``key``, or call ``build()`` and cache what
+    it returns unless that is ``None``. Counts a hit or miss for ``kind``.
+    """
+    value = cache.get(key)
+    if value is not None:
+        _incr(f'{PREFIX}:stats:{kind}:hits')
+        return value
+    _incr(f'{PREFIX}:stats:{kind}:misses')
+    value = build()
+    if value is not None:
+        cache.set(key, value, timeout=settings.API_CACHE_TIMEOUT)
+    return value
+
+
+async def acached(kind, key, build):
+    """cached() for async views; ``build`` is a coroutine function."""
+    value = await cache.aget(key)
+    if value is not None:
+        await _aincr(f'{PREFIX}:stats:{kind}:hits')
+        return value
+    await _aincr(f'{PREFIX}:stats:{kind}:misses')
+    value = await build()
+    if value is not None:
+        await cache.aset(key, value, timeout=settings.API_CACHE_TIMEOUT)
+    return value
+
+
+def stats():
+    """Hit and miss counts per kind of cached response since the counters were last reset."""
+    keys = [f'{PREFIX}:stats:{kind}:{outcome}' for kind in KINDS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    return {
+        kind: {
+            outcome: values.get(f'{PREFIX}:stats:{kind}:{outcome}', 0)
+            for outcome in ('hits', 'misses')
+        }
+        for kind in KINDS
+    }
+
+
+def reset_stats():
+    cache.delete_many([f'{PREFIX}:stats:{kind}:{outcome}' for kind in KINDS for outcome in ('hits', 'misses')])
@@ -0,0 +1,155 @@
+"""
+Deterministic synthetic data at production scale, for benchmarks.
+
+generate() writes users, students spread over departments with GPAs,
+lecturers dealt out over the same departments, ratings and optionally
+assignments, all with bulk inserts, so 200,000 students take minutes
+rather than hours. The same arguments and seed always give the same
+data. Every generated user has an email under ``EMAIL_DOMAIN`` and the
+one password ``DEFAULT_PASSWORD`` unless another is given; it is hashed
+once and shared. ``ADMIN_EMAIL`` is a staff user for driving the admin
+endpoints.
+
+Like the bulk imports, the per-row signals are skipped: lecturer rating
+counters are added up in memory and written in bulk, ranks are computed
+once per department, and the version counters are bumped at the end.
+Assignments come from a round-robin run over every student, as an admin
+would start it.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from userauths.models import User
+
+from . import ranking, ratings, versions
+from .assignment import run_assignments
+from .models import Lecturer, LecturerRating, Student
+
+EMAIL_DOMAIN = 'dataset.example.com'
+ADMIN_EMAIL = f'admin@{EMAIL_DOMAIN}'
+DEFAULT_PASSWORD = 'benchmark-password'
+
+DEFAULT_DEPARTMENTS = ('Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology')
+
+BATCH_SIZE = 5000
+
+
+class DatasetError(Exception):
+    pass
+
+
+def existing():
+    """Users already generated under EMAIL_DOMAIN."""
+    return User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+def clear():
+    """Delete every generated user; profiles, ratings and assignments go with them."""
+    with transaction.atomic():
+        deleted, _ = existing().delete()
+        versions.bump(versions.STUDENTS, versions.LECTURERS, versions.RATINGS, versions.ASSIGNMENTS)
+    return deleted
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _create_users(prefix, count, role, password, department_of):
+    users = []
+    for i in range(count):
+        department = department_of(i)
+        users.append(User(
+            email=f'{prefix}{i:07d}@{EMAIL_DOMAIN}', full_name=f'{prefix.title()} {i:07d}', role=role,
+            matric_number=f'G{i:08d}' if role == 'student' else None, department=department, password=password,
+        ))
+    for batch in _batches(users):
+        User.objects.bulk_create(batch)
+    if any(user.pk is None for user in users):
+        # Databases that cannot return ids from a bulk insert
+        ids = dict(existing().filter(role=role).values_list('email', 'pk'))
+        for user in users:
+            user.pk = ids[user.email]
+    return users
+
+
+def generate(students=10000, lecturers=100, departments=DEFAULT_DEPARTMENTS, ratings_per_student=3,
+             assign=True, seed=1, password=DEFAULT_PASSWORD, log=None):
+    """
+    Write a dataset of the given size and return a summary of it. Raises
+    :class:`DatasetError` if generated data already exists (see clear()).
+    """
+    log = log or (lambda message: None)
+    if existing().exists():
+        raise DatasetError(f"Generated users under @{EMAIL_DOMAIN} already exist; clear them first.")
+    if ratings_per_student > lecturers:
+        raise DatasetError("Students cannot rate more lecturers than there are.")
+
+    rnd = random.Random(seed)
+    departments = list(departments)
+    hashed = make_password(password)
+
+    with transaction.atomic():
+        User.objects.create(email=ADMIN_EMAIL, full_name='Dataset Admin', role='admin',
+                            is_staff=True, is_superuser=True, password=hashed)
+
+        log(f"Creating {students} students in {len(departments)} departments")
+        student_users = _create_users('student', students, 'student', hashed,
+                                      lambda i: rnd.choice(departments))
+        profiles = [
+            Student(user=user, matric_number=user.matric_number, department=user.department,
+                    gpa=Decimal(rnd.randint(100, 500)) / 100)
+            for user in student_users
+        ]
+        for batch in _batches(profiles):
+            Student.objects.bulk_create(batch)
+        student_ids = list(Student.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}')
+                           .order_by('matric_number').values_list('pk', flat=True))
+
+        log(f"Creating {lecturers} lecturers")
+        # Dealt out in turn so every department has lecturers of its own to
+        # be partitioned by, as long as there are enough of them
+        lecturer_users = _create_users('lecturer', lecturers, 'lecturer', hashed,
+                                       lambda i: departments[i % len(departments)])
+        for batch in _batches([Lecturer(user=user) for user in lecturer_users]):
+            Lecturer.objects.bulk_create(batch)
+        lecturer_ids = list(Lecturer.objects.filter(user__email__endswith=f'@{EMAIL_DOMAIN}')
+                            .order_by('user__email').values_list('pk', flat=True))
+
+        log(f"Creating {students * ratings_per_student} ratings")
+        totals = {}
+        batch = []
+        for student_id in student_ids:
+            for lecturer_id in rnd.sample(lecturer_ids, ratings_per_student):
+                value = rnd.randint(1, 5)
+                batch.append(LecturerRating(student_id=student_id, lecturer_id=lecturer_id, rating=value))
+                total, count = totals.get(lecturer_id, (0, 0))
+                totals[lecturer_id] = (total + value, count + 1)
+            if len(batch) >= BATCH_SIZE:
+                LecturerRating.objects.bulk_create(batch)
+                batch = []
+        LecturerRating.objects.bulk_create(batch)
+        for chunk in _batches(list(totals.items()), 500):
+            ratings.apply_deltas(dict(chunk))
+
+        log("Ranking departments")
+        for department in departments:
+            ranking.recompute_department(department)
+
+        versions.bump(versions.STUDENTS, versions.LECTURERS, versions.RATINGS)
+
+    summary = {
+        'students': students,
+        'lecturers': lecturers,
+        'departments': len(departments),
+        'ratings': students * ratings_per_student,
+        'assignments': 0,
+    }
+    if assign:
+        log("Assigning students")
+        summary['assignments'] = run_assignments()['assigned']
+    return summary
@@ -0,0 +1,141 @@
+"""
+Bulk ingest of end-of-semester GPAs.
+
+Rows of ``matric_number,gpa`` are read from CSV or NDJSON as a stream and
+validated in chunks. Changes are applied inside one transaction with one
+UPDATE per distinct GPA value (there are at most a few hundred), and ranks
+are recomputed exactly once for every department that changed. Saving
+students one by one instead would shift ranks once per row.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import ranking, versions
+from .bulk import DEFAULT_CHUNK_SIZE, FORMATS, MAX_REPORTED_ERRORS, chunks
+from .models import Student
+
+
+class GpaImportError(Exception):
+    """Raised when any row of an import is invalid; nothing is written."""
+
+    def __init__(self, errors, error_count):
+        super().__init__(f"{error_count} invalid row(s)")
+        self.errors = errors
+        self.error_count = error_count
+
+
+def _csv_rows(lines):
+    for line_no, row in enumerate(csv.reader(lines), start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if line_no == 1 and row[0].strip().lower() == 'matric_number':
+            continue  # header
+        if len(row) != 2:
+            yield line_no, None, None, "Expected two columns: matric_number,gpa"
+            continue
+        yield line_no, row[0].strip(), row[1].strip(), None
+
+
+def _ndjson_rows(lines):
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield line_no, str(record['matric_number']).strip(), record['gpa'], None
+        except (ValueError, TypeError, KeyError):
+            yield line_no, None, None, "Expected an object with matric_number and gpa"
+
+
+def parse_rows(lines, fmt):
+    """
+    Yield ``(line_no, matric_number, raw_gpa, error)`` for each record in ``lines``.
+
+    ``lines`` is any iterable of text lines, such as an open file or a decoded
+    request stream, so the input is never held in memory as a whole.
+    """
+    if fmt == 'csv':
+        return _csv_rows(lines)
+    if fmt == 'ndjson':
+        return _ndjson_rows(lines)
+    raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _clean_gpa(raw):
+    field = Student._meta.get_field('gpa')
+    value = field.clean(str(raw), None)
+    if value < 0:
+        raise ValidationError("GPA cannot be negative.")
+    return value.quantize(Decimal('0.01'))
+
+
+def import_gpas(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Apply parsed GPA rows and return a summary of what changed.
+
+    The import is all-or-nothing: if any row is invalid, refers to an unknown
+    matric number or repeats one seen earlier, :class:`GpaImportError` is
+    raised and the transaction is rolled back.
+    """
+    errors = []
+    error_count = 0
+    seen = set()
+    departments = set()
+    updates = {}
+    summary = {'rows': 0, 'updated': 0, 'unchanged': 0}
+
+    def fail(line_no, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_no, 'error': message})
+
+    with transaction.atomic():
+        for chunk in chunks(rows, chunk_size):
+            gpas = {}
+            for line_no, matric_number, raw_gpa, error in chunk:
+                summary['rows'] += 1
+                if error:
+                    fail(line_no, error)
+                    continue
+                if matric_number in seen:
+                    fail(line_no, f"Duplicate matric number {matric_number}")
+                    continue
+                seen.add(matric_number)
+                try:
+                    gpas[matric_number] = (line_no, _clean_gpa(raw_gpa))
+                except ValidationError as e:
+                    fail(line_no, f"Invalid GPA {raw_gpa!r}: {' '.join(e.messages)}")
+
+            students = Student.objects.filter(matric_number__in=gpas).values_list(
+                'pk', 'matric_number', 'department', 'gpa', named=True
+            )
+            for student in students:
+                _, gpa = gpas.pop(student.matric_number)
+                if student.gpa == gpa:
+                    summary['unchanged'] += 1
+                    continue
+                updates.setdefault(gpa, []).append(student.pk)
+                departments.add(student.department)
+                summary['updated'] += 1
+            for matric_number, (line_no, _) in gpas.items():
+                fail(line_no, f"Unknown matric number {matric_number}")
+
+        if error_count:
+            raise GpaImportError(errors, error_count)
+
+        for gpa, pks in updates.items():
+            for start in range(0, len(pks), chunk_size):
+                Student.objects.filter(pk__in=pks[start:start + chunk_size]).update(gpa=gpa)
+
+        rank_rows = sum(ranking.recompute_department(department) for department in sorted(departments))
+        if departments:
+            versions.bump(versions.STUDENTS)
+
+    summary['departments'] = sorted(departments)
+    summary['rank_rows_touched'] = rank_rows
+    return summary
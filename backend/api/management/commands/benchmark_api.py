@@ -0,0 +1,310 @@
+import json
+import logging
+import math
+import subprocess
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from api import dataset, ranking, versions
+from api.assignment import run_assignments
+from api.middleware import COUNT_HEADER, QueryRecorder
+from api.models import Assignment, Lecturer, LecturerRating, Student
+from api.testing import QUERY_BUDGETS, query_count
+from userauths.models import User
+from userauths.serializers import MyTokenObtainPairSerializer
+
+# Endpoints that hash passwords cost hundreds of milliseconds a request by
+# design; they get fewer iterations so they do not dominate the run.
+SLOW = {'login', 'register', 'change_password', 'user-import'}
+
+# URL names under api/v1/ that are deliberately not driven
+NOT_DRIVEN = set()
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of the sorted ``values``."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def _summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        'iterations': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _url_names(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _url_names(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and route.startswith('api/v1/') and pattern.name:
+            yield pattern.name
+
+
+class Command(BaseCommand):
+    help = ("Drive every /api/v1/ endpoint, the rank recompute and the assignment run against the "
+            "current database and write latency percentiles and query counts to a JSON file. "
+            "Writes are rolled back. Meant for a generate_dataset database; pass --compare with "
+            "an earlier file to see the change between commits. Exits non-zero when an endpoint "
+            "runs more queries than its QUERY_BUDGETS entry.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Requests per endpoint.")
+        parser.add_argument('--slow-iterations', type=int, default=3,
+                            help="Requests per endpoint that hashes passwords.")
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--password', default=dataset.DEFAULT_PASSWORD,
+                            help="Password of the admin user, for the login endpoints.")
+        parser.add_argument('--output', default='benchmark_api.json', help="JSON file to write.")
+        parser.add_argument('--compare', help="Earlier JSON output to compare with.")
+        parser.add_argument('--only', action='append',
+                            help="URL name or operation to run; repeat for several. Defaults to all.")
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(email=dataset.ADMIN_EMAIL).first() or \
+            User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
+        assignment = Assignment.objects.select_related('student__user', 'lecturer__user').order_by('pk').first()
+        if admin is None or assignment is None:
+            raise CommandError("Needs an admin and at least one assignment; run generate_dataset first.")
+        self.options = options
+        self.admin = admin
+        self.student = assignment.student
+        self.lecturer = assignment.lecturer
+        rated = LecturerRating.objects.filter(student=self.student).values('lecturer_id')
+        self.unrated = list(Lecturer.objects.exclude(pk__in=rated).order_by('pk').values_list('pk', flat=True)[:2])
+        if len(self.unrated) < 2:
+            raise CommandError("Needs two lecturers the benchmark student has not rated.")
+
+        # The report carries the query counts and statuses; the per-request
+        # SQL log and 4xx warnings would only drown it out
+        logging.getLogger('api.sql').setLevel(logging.ERROR)
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        # Start any missing version counters now: started inside a rolled-back
+        # request they would be started again, at a query each, every time
+        versions.current([*versions.RESOURCES, versions.lecturer(self.lecturer.pk)])
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                               SQL_INSTRUMENTATION=True, SQL_QUERY_HEADERS=True):
+            for name, method, path, user, kwargs in self.scenarios():
+                if self.selected(name):
+                    results[name] = self.measure_endpoint(name, method, path, user, kwargs)
+                    self.report(name, results[name])
+        for name, operation, rollback in self.operations():
+            if self.selected(name):
+                results[name] = self.measure_operation(operation, rollback)
+                self.report(name, results[name])
+
+        driven = {name for name, *_ in self.scenarios()}
+        for name in sorted(set(_url_names(get_resolver().url_patterns)) - driven - NOT_DRIVEN):
+            self.stderr.write(f"No scenario drives the {name!r} endpoint.")
+
+        output = {'meta': self.meta(), 'results': results}
+        with open(options['output'], 'w') as f:
+            json.dump(output, f, indent=2)
+        self.stdout.write(f"Wrote {options['output']}")
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+        over = sorted(name for name, result in results.items() if self.over_budget(result))
+        if over:
+            raise CommandError(f"Over the query budget: {', '.join(over)}")
+
+    def selected(self, name):
+        return not self.options['only'] or name in self.options['only']
+
+    def scenarios(self):
+        """(URL name, method, path, user, request arguments) for every endpoint."""
+        size = self.options['page_size']
+        student, lecturer, admin = self.student, self.lecturer, self.admin
+        password = self.options['password']
+        matrics = Student.objects.order_by('pk').values_list('matric_number', 'gpa')[:100]
+        # Mirrored GPAs, so every row changes and its department is re-ranked
+        gpas = ''.join(f'{matric},{6 - gpa}\n' for matric, gpa in matrics)
+        users = ''.join(
+            json.dumps({'email': f'benchmark{i}@{dataset.EMAIL_DOMAIN}', 'full_name': f'Benchmark {i}',
+                        'role': 'lecturer', 'password': password}) + '\n'
+            for i in range(2)
+        )
+        registration = {'email': f'register@{dataset.EMAIL_DOMAIN}', 'full_name': 'Register', 'role': 'student',
+                        'password': password, 'password2': password, 'matric_number': 'REGISTER1',
+                        'department': student.department}
+        return [
+            ('login', 'post', reverse('login'), None, {'data': {'email': admin.email, 'password': password}}),
+            ('token_refresh', 'post', reverse('token_refresh'), None,
+             {'data': {'refresh': str(MyTokenObtainPairSerializer.get_token(admin))}}),
+            ('register', 'post', reverse('register'), None, {'data': registration}),
+            ('change_password', 'post', reverse('change_password'), admin,
+             {'data': {'old_password': password, 'new_password': password + '2',
+                       'new_password2': password + '2'}}),
+            ('user-detail', 'get', reverse('user-detail'), admin, {}),
+            ('user-import', 'post', reverse('user-import'), admin,
+             {'data': users, 'content_type': 'application/x-ndjson'}),
+            ('student-list', 'get', reverse('student-list'), admin, {'data': {'page_size': size}}),
+            ('student-detail', 'get', reverse('student-detail', args=[student.pk]), admin, {}),
+            ('student-gpa-import', 'post', reverse('student-gpa-import'), admin,
+             {'data': gpas, 'content_type': 'text/csv'}),
+            ('supervisor-assigned-to-student', 'get',
+             reverse('supervisor-assigned-to-student', args=[student.pk]), student.user, {}),
+            ('lecturer-list', 'get', reverse('lecturer-list'), student.user, {'data': {'page_size': size}}),
+            ('lecturer-detail', 'get', reverse('lecturer-detail', args=[lecturer.pk]), student.user, {}),
+            ('lecturer-ratings', 'get', reverse('lecturer-ratings', args=[lecturer.pk]), lecturer.user,
+             {'data': {'page_size': size}}),
+            ('students-assigned-to-lecturer', 'get', reverse('students-assigned-to-lecturer', args=[lecturer.pk]),
+             lecturer.user, {'data': {'page_size': size}}),
+            ('rating-create', 'post', reverse('rating-create'), student.user,
+             {'data': {'student': student.pk, 'lecturer': self.unrated[0], 'rating': 4}}),
+            ('rating-bulk-create', 'post', reverse('rating-bulk-create'), student.user,
+             {'data': {'ratings': [{'lecturer': pk, 'rating': 3} for pk in self.unrated]},
+              'content_type': 'application/json'}),
+            ('assign-students', 'post', reverse('assign-students'), admin,
+             {'data': {'dry_run': True}, 'content_type': 'application/json'}),
+            ('assignments', 'get', reverse('assignments'), admin, {'data': {'page_size': size}}),
+            ('assignments-export-csv', 'get', reverse('assignments-export-csv'), admin, {}),
+            ('assignments-export-xlsx', 'get', reverse('assignments-export-xlsx'), admin, {}),
+            ('async-student-list', 'get', reverse('async-student-list'), admin, {'data': {'page_size': size}}),
+            ('async-supervisor-assigned-to-student', 'get',
+             reverse('async-supervisor-assigned-to-student', args=[student.pk]), student.user, {}),
+            ('async-lecturer-list', 'get', reverse('async-lecturer-list'), student.user,
+             {'data': {'page_size': size}}),
+            ('async-students-assigned-to-lecturer', 'get',
+             reverse('async-students-assigned-to-lecturer', args=[lecturer.pk]), lecturer.user,
+             {'data': {'page_size': size}}),
+            ('cache-stats', 'get', reverse('cache-stats'), admin, {}),
+        ]
+
+    def operations(self):
+        """
+        (name, callable, rollback) for the work measured outside a request.
+        Work that writes runs in a transaction that is rolled back; dry runs
+        need none, and outside one the by-department run starts its workers.
+        """
+        departments = list(Student.objects.order_by().values_list('department', flat=True).distinct())
+
+        def recompute():
+            # Against ranks cleared first, so every row is rewritten
+            Student.objects.update(rank=0)
+            for department in departments:
+                ranking.recompute_department(department)
+
+        return [
+            ('rank-recompute', recompute, True),
+            ('assignment-run', lambda: run_assignments(), True),
+            ('assignment-dry-run', lambda: run_assignments(dry_run=True), False),
+            ('assignment-dry-run-by-department', lambda: run_assignments(by_department=True, dry_run=True), False),
+        ]
+
+    def iterations(self, name):
+        return self.options['slow_iterations'] if name in SLOW else self.options['iterations']
+
+    def measure_endpoint(self, name, method, path, user, kwargs):
+        client = Client()
+        if user is not None:
+            token = MyTokenObtainPairSerializer.get_token(user).access_token
+            client = Client(headers={'Authorization': f'Bearer {token}'})
+
+        latencies, queries, statuses = [], [], set()
+        for _ in range(self.iterations(name)):
+            with transaction.atomic():
+                started = time.perf_counter()
+                response = getattr(client, method)(path, **kwargs)
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                latencies.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+            statuses.add(response.status_code)
+            if response.has_header(COUNT_HEADER):
+                queries.append(query_count(response))
+
+        result = _summary(latencies)
+        result.update(method=method.upper(), path=path, statuses=sorted(statuses),
+                      queries=max(queries) if queries else None)
+        if name in QUERY_BUDGETS:
+            result['query_budget'] = QUERY_BUDGETS[name]
+        return result
+
+    def measure_operation(self, operation, rollback):
+        latencies = []
+        recorder = QueryRecorder(keep=0)
+        for _ in range(self.options['slow_iterations']):
+            recorder.count = 0
+            with transaction.atomic() if rollback else nullcontext(), recorder.install():
+                started = time.perf_counter()
+                operation()
+                latencies.append(time.perf_counter() - started)
+                if rollback:
+                    transaction.set_rollback(True)
+        result = _summary(latencies)
+        result['queries'] = recorder.count
+        return result
+
+    @staticmethod
+    def over_budget(result):
+        return result.get('query_budget') is not None and (result['queries'] or 0) > result['query_budget']
+
+    def report(self, name, result):
+        over = self.over_budget(result)
+        errors = [status for status in result.get('statuses', []) if status >= 400]
+        self.stdout.write(
+            f"{name:<40} p50 {result['p50_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms  "
+            f"p99 {result['p99_ms']:9.1f} ms  {result['queries']} queries"
+            + (f" (budget {result['query_budget']})" if over else "")
+            + (f"  status {', '.join(map(str, errors))}" if errors else "")
+        )
+
+    def meta(self):
+        return {
+            'commit': _git_commit(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'iterations': self.options['iterations'],
+            'slow_iterations': self.options['slow_iterations'],
+            'page_size': self.options['page_size'],
+            'rows': {
+                'users': User.objects.count(),
+                'students': Student.objects.count(),
+                'lecturers': Lecturer.objects.count(),
+                'ratings': LecturerRating.objects.count(),
+                'assignments': Assignment.objects.count(),
+            },
+        }
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f"Compared with {path} (commit {previous['meta'].get('commit')}):")
+        for name, result in results.items():
+            before = previous['results'].get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            queries = ''
+            if before.get('queries') != result['queries']:
+                queries = f"  queries {before.get('queries')} -> {result['queries']}"
+            self.stdout.write(
+                f"{name:<40} p50 {before['p50_ms']:9.1f} -> {result['p50_ms']:9.1f} ms ({change:+6.1f}%){queries}"
+            )
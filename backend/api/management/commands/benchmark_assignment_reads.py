@@ -0,0 +1,65 @@
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Assignment
+from api.serializers import AssignmentSerializer, flat_assignment_data, flat_assignment_rows
+
+
+class Command(BaseCommand):
+    help = ("Time reading assignments through the nested AssignmentSerializer against the flat "
+            "values() pipeline (?view=flat), from query to rendered JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000,
+                            help="Number of assignments to read (the first N by id).")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs per pipeline; the fastest is reported.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        available = Assignment.objects.count()
+        if not available:
+            raise CommandError("There are no assignments to read; run an assignment first.")
+        if available < rows:
+            self.stderr.write(f"Only {available} assignments exist; reading all of them.")
+
+        pipelines = {
+            'nested': lambda: AssignmentSerializer(
+                Assignment.objects.select_related('student__user', 'lecturer__user').order_by('id')[:rows],
+                many=True,
+            ).data,
+            'nested (no select_related)': lambda: AssignmentSerializer(
+                Assignment.objects.order_by('id')[:rows], many=True,
+            ).data,
+            'flat': lambda: flat_assignment_data(list(flat_assignment_rows(Assignment.objects.order_by('id')[:rows]))),
+        }
+        if options['rows'] > 1000:
+            # One query per row and related object; only worth timing on small reads
+            del pipelines['nested (no select_related)']
+
+        results = {}
+        for name, build in pipelines.items():
+            best = None
+            for _ in range(max(options['repeat'], 1)):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    body = JSONRenderer().render(build())
+                    elapsed = time.perf_counter() - start
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, len(queries), len(body))
+            results[name] = best
+
+        count = min(rows, available)
+        for name, (elapsed, queries, size) in results.items():
+            self.stdout.write(
+                f"{name:>28}: {elapsed * 1000:8.1f} ms  {count / elapsed:9.0f} rows/s  "
+                f"{queries:5d} queries  {size / 1024:8.0f} KiB"
+            )
+        if 'nested' in results and 'flat' in results:
+            self.stdout.write(self.style.SUCCESS(
+                f"flat is {results['nested'][0] / results['flat'][0]:.1f}x faster than nested"
+            ))
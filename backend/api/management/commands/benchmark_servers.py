@@ -0,0 +1,108 @@
+import os
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Assignment
+from userauths.models import User
+from userauths.serializers import MyTokenObtainPairSerializer
+
+SERVERS = {
+    # name: (command line, URL prefix of the endpoints it serves)
+    'wsgi': (['gunicorn', 'backend.wsgi:application', '--workers', '{workers}', '--bind', '127.0.0.1:{port}'],
+             '/api/v1/'),
+    'asgi': (['uvicorn', 'backend.asgi:application', '--workers', '{workers}', '--port', '{port}',
+              '--no-access-log'], '/api/v1/async/'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync read endpoints under gunicorn (WSGI) with their async versions under uvicorn "
+            "(ASGI), at the same worker count: throughput and latency under concurrent requests.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Worker processes for each server.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight at once.")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per endpoint and server.")
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--server', choices=list(SERVERS), action='append',
+                            help="Server to measure; repeat for several. Defaults to both.")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_staff=True, is_active=True).first()
+        assignment = Assignment.objects.order_by('pk').first()
+        if user is None or assignment is None:
+            raise CommandError("Needs an active staff user and at least one assignment.")
+        token = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+        size = options['page_size']
+        endpoints = [
+            f'students/?page_size={size}',
+            f'lecturers/?page_size={size}',
+            f'student/{assignment.student_id}/supervisor/',
+            f'lecturer/{assignment.lecturer_id}/students/?page_size={size}',
+        ]
+
+        for name in options['server'] or SERVERS:
+            command, prefix = SERVERS[name]
+            command = [part.format(workers=options['workers'], port=options['port']) for part in command]
+            base = f"http://127.0.0.1:{options['port']}{prefix}"
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy(),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                self._wait_until_up(server, base + endpoints[0], token)
+                for endpoint in endpoints:
+                    # Warm every worker up before measuring
+                    self._measure(name, base + endpoint, token, dict(options, requests=options['concurrency']), quiet=True)
+                    self._measure(name, base + endpoint, token, options)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def _wait_until_up(self, server, url, token, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"{server.args[0]} exited with status {server.returncode}.")
+            try:
+                response = requests.get(url, headers={'Authorization': f'Bearer {token}'}, timeout=5)
+            except (requests.ConnectionError, requests.Timeout):
+                time.sleep(0.2)
+                continue
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} answered {response.status_code}; is 127.0.0.1 in ALLOWED_HOSTS?")
+            return
+        raise CommandError(f"{server.args[0]} did not start within {timeout}s.")
+
+    def _measure(self, name, url, token, options, quiet=False):
+        local = threading.local()
+
+        def fetch(_):
+            # One keep-alive connection per client thread
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            started = time.perf_counter()
+            response = local.session.get(url, headers={'Authorization': f'Bearer {token}'})
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        if quiet:
+            return
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{name} {url.split('/api/v1/', 1)[1]:<45} {len(results) / elapsed:8.1f} req/s  "
+            f"p50 {cuts[49] * 1000:7.1f} ms  p95 {cuts[94] * 1000:7.1f} ms  p99 {cuts[98] * 1000:7.1f} ms"
+            + (f"  {errors} errors" if errors else "")
+        )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import dataset
+
+
+class Command(BaseCommand):
+    help = (f"Generate a deterministic dataset of users, students, lecturers, ratings and assignments "
+            f"with bulk inserts. Generated users have emails under @{dataset.EMAIL_DOMAIN}.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--lecturers', type=int, default=100)
+        parser.add_argument('--departments', type=int, default=len(dataset.DEFAULT_DEPARTMENTS),
+                            help="Number of departments; past the named defaults they are numbered.")
+        parser.add_argument('--ratings-per-student', type=int, default=3)
+        parser.add_argument('--no-assign', action='store_false', dest='assign',
+                            help="Leave the students unassigned.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--password', default=dataset.DEFAULT_PASSWORD,
+                            help="Password of every generated user.")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete previously generated data first.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f"Deleted {dataset.clear()} generated rows.")
+
+        count = options['departments']
+        departments = list(dataset.DEFAULT_DEPARTMENTS[:count])
+        departments += [f'Department {i}' for i in range(len(departments) + 1, count + 1)]
+
+        started = time.perf_counter()
+        try:
+            summary = dataset.generate(
+                students=options['students'], lecturers=options['lecturers'], departments=departments,
+                ratings_per_student=options['ratings_per_student'], assign=options['assign'],
+                seed=options['seed'], password=options['password'], log=self.stdout.write,
+            )
+        except dataset.DatasetError as e:
+            raise CommandError(f"{e} Pass --clear to replace them.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {summary['students']} students in {summary['departments']} departments, "
+            f"{summary['lecturers']} lecturers, {summary['ratings']} ratings and {summary['assignments']} "
+            f"assignments in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import DEFAULT_CHUNK_SIZE, FORMATS, format_for_path
+from api.gpa_import import GpaImportError, import_gpas, parse_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-load student GPAs from a CSV or NDJSON file of matric_number,gpa rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - to read standard input.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Input format. Defaults to the file extension (.csv, .ndjson/.jsonl).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Rows validated and written per batch.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            fmt = format_for_path(path)
+        if fmt is None:
+            raise CommandError("Cannot infer the format from the file name; pass --format.")
+
+        if path == '-':
+            summary = self._import(sys.stdin, fmt, options['chunk_size'])
+        else:
+            with open(path, encoding='utf-8', newline='') as f:
+                summary = self._import(f, fmt, options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['rows']} rows: {summary['updated']} updated, {summary['unchanged']} unchanged; "
+            f"re-ranked {len(summary['departments'])} department(s), {summary['rank_rows_touched']} rank rows touched."
+        ))
+
+    def _import(self, lines, fmt, chunk_size):
+        try:
+            return import_gpas(parse_rows(lines, fmt), chunk_size=chunk_size)
+        except GpaImportError as e:
+            for error in e.errors:
+                self.stderr.write(f"line {error['line']}: {error['error']}")
+            raise CommandError(f"{e}; nothing was imported.")
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk import DEFAULT_CHUNK_SIZE, FORMATS, format_for_path
+from api.user_import import FIELDS, UserImportError, import_users, parse_rows
+
+
+class Command(BaseCommand):
+    help = (f"Bulk-register users from a CSV file with a header row or an NDJSON file of objects, "
+            f"with the fields {', '.join(FIELDS)}.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - to read standard input.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Input format. Defaults to the file extension (.csv, .ndjson/.jsonl).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Rows validated and written per batch.")
+        parser.add_argument('--workers', type=int,
+                            help="Processes hashing passwords. Defaults to USER_IMPORT_WORKERS, or one per CPU.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            fmt = format_for_path(path)
+        if fmt is None:
+            raise CommandError("Cannot infer the format from the file name; pass --format.")
+
+        started = time.perf_counter()
+        if path == '-':
+            summary = self._import(sys.stdin, fmt, options)
+        else:
+            with open(path, encoding='utf-8', newline='') as f:
+                summary = self._import(f, fmt, options)
+
+        created = ', '.join(f"{count} {role}(s)" for role, count in summary['created'].items() if count)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['rows']} users ({created or 'none'}) in {time.perf_counter() - started:.1f}s "
+            f"with {summary['hash_workers']} hashing worker(s); re-ranked {len(summary['departments'])} "
+            f"department(s), {summary['rank_rows_touched']} rank rows touched."
+        ))
+
+    def _import(self, lines, fmt, options):
+        try:
+            workers = settings.USER_IMPORT_WORKERS if options['workers'] is None else options['workers']
+            return import_users(parse_rows(lines, fmt), chunk_size=options['chunk_size'], workers=workers)
+        except UserImportError as e:
+            for error in e.errors:
+                self.stderr.write(f"line {error['line']}: {error['error']}")
+            raise CommandError(f"{e}; nothing was imported.")
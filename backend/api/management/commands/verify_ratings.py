@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ratings import verify
+
+
+class Command(BaseCommand):
+    help = "Check every lecturer's rating sum, count and average against their actual ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help="Recompute the lecturers whose counters are wrong.")
+
+    def handle(self, *args, **options):
+        mismatches = verify(fix=options['fix'])
+        for mismatch in mismatches:
+            self.stderr.write(
+                f"lecturer {mismatch['lecturer']}: stored sum/count/average {self._format(mismatch['stored'])}, "
+                f"actual {self._format(mismatch['actual'])}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All lecturer rating aggregates are correct."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} lecturer(s)."))
+        else:
+            raise CommandError(f"{len(mismatches)} lecturer(s) out of date; run with --fix to repair them.")
+
+    @staticmethod
+    def _format(values):
+        return "/".join(str(value) for value in values)
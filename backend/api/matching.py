@@ -0,0 +1,248 @@
+"""
+Matching algorithms over compact integer arrays.
+
+Nothing in here touches the ORM. Students and lecturers are plain indices
+(``0..n-1`` and ``0..m-1``); :mod:`api.assignment` loads the data, maps ids to
+indices and writes the result back.
+
+Preferences are passed in CSR layout: the lecturers student ``i`` has an
+explicit opinion about are ``pref_lecturer[pref_start[i]:pref_start[i + 1]]``
+with the matching values in ``pref_value``.
+"""
+import heapq
+import time
+from collections import deque
+
+UNASSIGNED = -1
+
+# How often (in bids) the auction looks at the clock
+_DEADLINE_CHECK_EVERY = 1024
+
+
+def auction(capacity, quality, pref_start, pref_lecturer, pref_value, epsilon=1, time_budget=None,
+            band=None, band_weight=(0,), affinity=None):
+    """
+    Capacity-constrained assignment that maximises total student value.
+
+    Solves the transportation problem
+
+        maximise   sum(value[i][j] * x[i][j])
+        subject to sum_j x[i][j] == 1          for every student i
+                   sum_i x[i][j] <= capacity[j] for every lecturer j
+
+    where ``value[i][j]`` is ``pref_value`` for the lecturers student ``i``
+    listed and ``quality[j]`` for every other lecturer, plus an affinity
+    term ``band_weight[band[i]] * affinity[j]``: students are grouped into a
+    few bands (by rank, say) and a band with a higher weight gains more from
+    a lecturer with a higher affinity, so when values otherwise tie those
+    students are steered to those lecturers. Values are integers and the
+    caller must make sure ``sum(capacity) >= n``.
+
+    Uses Bertsekas' forward auction for similar objects. A lecturer's price
+    is zero while it has a free slot and otherwise the lowest bid it holds.
+    The best lecturer a student has no explicit value for is found from a
+    lazily-updated max-heap over ``quality[j] - price[j]``, one per band,
+    so a bid costs ``O(d + log m)`` for a student with ``d`` explicit
+    preferences instead of ``O(m)``, and a price change ``O(b log m)`` for
+    ``b`` bands. The number of bids is ``O(n * C / epsilon)`` in the worst case
+    (``C`` the value range) and a small multiple of ``n`` in practice; the
+    result is within ``n * epsilon`` of the optimum, and optimal outright
+    when values are multiplied by ``n + 1``.
+
+    If ``time_budget`` seconds elapse, bidding stops and the students still
+    unassigned are placed greedily on lecturers with free slots.
+
+    Returns ``(lecturer_for_student, stats)``.
+    """
+    n = len(pref_start) - 1
+    m = len(capacity)
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    if band is None:
+        band = bytes(n)  # every student in band 0
+    if affinity is None:
+        affinity = [0] * m
+    # What lecturer j is worth to a student of band b, before their own ratings
+    default_value = [[quality[j] + weight * affinity[j] for j in range(m)] for weight in band_weight]
+
+    owner = [UNASSIGNED] * n
+    price = [0] * m
+    holders = [[] for _ in range(m)]  # min-heaps of (bid, student)
+    # Per band, a max-heap of (-(value - price), lecturer, price when pushed); stale entries are skipped
+    defaults = []
+    for values in default_value:
+        heap = [(-values[j], j, 0) for j in range(m) if capacity[j] > 0]
+        heapq.heapify(heap)
+        defaults.append(heap)
+
+    queue = deque(range(n))
+    bids = 0
+    while queue:
+        bids += 1
+        if deadline is not None and bids % _DEADLINE_CHECK_EVERY == 0 and time.monotonic() > deadline:
+            break
+        i = queue.popleft()
+        b = band[i]
+        weight = band_weight[b]
+        default = defaults[b]
+
+        best = second = None
+        best_j = UNASSIGNED
+        start, end = pref_start[i], pref_start[i + 1]
+        for k in range(start, end):
+            j = pref_lecturer[k]
+            if capacity[j] <= 0:
+                continue
+            v = pref_value[k] + weight * affinity[j] - price[j]
+            if best is None or v > best:
+                second, best, best_j = best, v, j
+            elif second is None or v > second:
+                second = v
+
+        # Two best lecturers the student has no explicit value for
+        explicit = pref_lecturer[start:end]
+        kept = []
+        found = 0
+        while default and found < 2:
+            entry = heappop(default)
+            neg_value, j, seen_price = entry
+            if seen_price != price[j]:
+                continue  # stale
+            kept.append(entry)
+            if j in explicit:
+                continue
+            found += 1
+            v = -neg_value
+            if best is None or v > best:
+                second, best, best_j = best, v, j
+            elif second is None or v > second:
+                second = v
+        for entry in kept:
+            heappush(default, entry)
+
+        if second is None:
+            second = best
+        held = holders[best_j]
+        heappush(held, (price[best_j] + best - second + epsilon, i))
+        owner[i] = best_j
+        if len(held) > capacity[best_j]:
+            _, evicted = heappop(held)
+            owner[evicted] = UNASSIGNED
+            queue.append(evicted)
+        if len(held) == capacity[best_j] and held[0][0] != price[best_j]:
+            price[best_j] = held[0][0]
+            for values, heap in zip(default_value, defaults):
+                heappush(heap, (price[best_j] - values[best_j], best_j, price[best_j]))
+
+    stats = {'bids': bids, 'converged': not queue}
+    if queue:
+        _greedy_fill(queue, owner, holders, capacity, quality, pref_start, pref_lecturer, pref_value,
+                     band, band_weight, affinity, default_value)
+    return owner, stats
+
+
+def _greedy_fill(students, owner, holders, capacity, quality, pref_start, pref_lecturer, pref_value,
+                 band, band_weight, affinity, default_value):
+    """
+    Place ``students`` on the free lecturer they value most, ignoring prices.
+    Lecturers the student did not rate are taken in ``quality`` order.
+    """
+    load = [len(held) for held in holders]
+    by_quality = sorted((j for j in range(len(capacity)) if load[j] < capacity[j]), key=lambda j: -quality[j])
+    cursor = 0
+    for i in students:
+        while cursor < len(by_quality) and load[by_quality[cursor]] >= capacity[by_quality[cursor]]:
+            cursor += 1
+        best_j = by_quality[cursor] if cursor < len(by_quality) else UNASSIGNED
+        best = default_value[band[i]][best_j] if best_j != UNASSIGNED else None
+        weight = band_weight[band[i]]
+        for k in range(pref_start[i], pref_start[i + 1]):
+            j = pref_lecturer[k]
+            value = pref_value[k] + weight * affinity[j]
+            if load[j] < capacity[j] and (best is None or value > best):
+                best, best_j = value, j
+        if best_j != UNASSIGNED:
+            owner[i] = best_j
+            load[best_j] += 1
+
+
+def deferred_acceptance(capacity, quality, pref_start, pref_lecturer, pref_value):
+    """
+    Student-proposing deferred acceptance (Gale-Shapley) with capacities.
+
+    Student ``i``'s preference list merges the lecturers they rated, best
+    ``pref_value`` first (each segment must be sorted that way), with every
+    other lecturer ordered by ``quality``. The merged list is walked lazily
+    with two cursors, so it is never materialised. Lecturers prefer students
+    with a lower index, i.e. students are passed in rank order.
+
+    The result is the student-optimal stable matching: no student and
+    lecturer would both rather be matched to each other than to whom they
+    got. Because all lecturers share one priority order and the best-ranked
+    free student always proposes next, a full lecturer rejects everyone who
+    proposes after it fills up. The ``quality`` cursor therefore jumps over
+    full lecturers through a union-find "next open lecturer" table, and the
+    run costs ``O(n * (d + log c) + m)`` (``d`` explicit preferences, ``c``
+    the largest capacity) instead of up to ``n * m`` proposals.
+
+    Returns ``(lecturer_for_student, stats)``.
+    """
+    n = len(pref_start) - 1
+    m = len(capacity)
+    heappush, heapreplace = heapq.heappush, heapq.heapreplace
+    by_quality = sorted(range(m), key=lambda j: (-quality[j], j))
+    position = [0] * m
+    for g, j in enumerate(by_quality):
+        position[j] = g
+    # open_from[g] leads to the first lecturer at or after quality position g with room
+    open_from = [g if capacity[j] > 0 else g + 1 for g, j in enumerate(by_quality)] + [m]
+
+    def next_open(g):
+        while open_from[g] != g:
+            open_from[g] = open_from[open_from[g]]
+            g = open_from[g]
+        return g
+
+    owner = [UNASSIGNED] * n
+    held = [[] for _ in range(m)]  # max-heaps of -student: the worst held student is on top
+    next_explicit = list(pref_start[:n])
+    next_default = [0] * n
+    free = list(range(n - 1, -1, -1))  # best-ranked student proposes first
+    proposals = 0
+
+    while free:
+        i = free.pop()
+        start, end = pref_start[i], pref_start[i + 1]
+        explicit = pref_lecturer[start:end]
+
+        g = next_open(next_default[i])
+        while g < m and by_quality[g] in explicit:
+            g = next_open(g + 1)
+        next_default[i] = g
+        e = next_explicit[i]
+        if e < end and (g >= m or pref_value[e] >= quality[by_quality[g]]):
+            j = pref_lecturer[e]
+            next_explicit[i] = e + 1
+        elif g < m:
+            j = by_quality[g]
+            next_default[i] = g + 1
+        else:
+            continue  # proposed to everyone; stays unassigned
+
+        proposals += 1
+        heap = held[j]
+        if len(heap) < capacity[j]:
+            heappush(heap, -i)
+            owner[i] = j
+            if len(heap) == capacity[j]:
+                open_from[position[j]] = position[j] + 1
+        elif heap and -heap[0] > i:
+            rejected = -heapreplace(heap, -i)
+            owner[rejected] = UNASSIGNED
+            owner[i] = j
+            free.append(rejected)
+        else:
+            free.append(i)
+
+    return owner, {'proposals': proposals}
@@ -0,0 +1,162 @@
+"""
+Per-request SQL instrumentation.
+
+QueryInstrumentationMiddleware wraps every database connection with
+``execute_wrapper`` for the length of a request and records how many
+statements ran, their total time and the slowest few. When
+``SQL_QUERY_HEADERS`` is on (by default only with ``DEBUG``) the count and
+time go back to the client as ``X-DB-Query-Count`` and
+``X-DB-Query-Time-Ms`` headers, which is what api.testing checks query
+budgets against. The whole record is logged to the ``api.sql`` logger as
+one JSON object:
+at INFO normally, at WARNING when the request ran more than
+``SQL_WARN_QUERIES`` statements or spent more than ``SQL_WARN_MS`` in them.
+
+A streaming response (the exports) runs most of its statements while its
+body is sent, after the headers have gone out. Its body is wrapped so that
+those statements are recorded too: the headers carry the count up to the
+first byte, and the log record, written once the body is finished, the
+whole request. The recorder is left on the response as ``query_recorder``,
+so tests and benchmarks that read the body can check the full count.
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.sql')
+
+COUNT_HEADER = 'X-DB-Query-Count'
+TIME_HEADER = 'X-DB-Query-Time-Ms'
+
+# Characters of each slow statement kept in the log
+STATEMENT_LENGTH = 500
+
+# Transaction control is not counted: an atomic block issues savepoint
+# statements only when it is nested, as in tests, and BEGIN/COMMIT never
+# pass through execute(), so counting them would make a request's count
+# depend on where it runs.
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryRecorder:
+    """Counts and times the statements run through the connections while installed."""
+
+    def __init__(self, keep=3):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(SAVEPOINT_STATEMENTS):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.keep:
+                entry = (elapsed, self.count, sql)
+                if len(self._slowest) < self.keep:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heappushpop(self._slowest, entry)
+
+    @contextmanager
+    def install(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def slowest(self):
+        """The slowest statements, slowest first, as ``{'ms': ..., 'sql': ...}``."""
+        return [
+            {'ms': round(elapsed * 1000, 2), 'sql': sql[:STATEMENT_LENGTH]}
+            for elapsed, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.SQL_INSTRUMENTATION
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        recorder = QueryRecorder(keep=settings.SQL_SLOW_STATEMENTS)
+        started = time.perf_counter()
+        with recorder.install():
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        recorder = QueryRecorder(keep=settings.SQL_SLOW_STATEMENTS)
+        started = time.perf_counter()
+        with recorder.install():
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        # Read per request so tests can turn the headers on with override_settings
+        if settings.SQL_QUERY_HEADERS:
+            response[COUNT_HEADER] = str(recorder.count)
+            response[TIME_HEADER] = f'{recorder.duration_ms:.1f}'
+        response.query_recorder = recorder
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.record_stream(
+                response.streaming_content, request, response, recorder, started
+            )
+        else:
+            self.log(request, response, recorder, started)
+        return response
+
+    def record_stream(self, content, request, response, recorder, started):
+        """Yield the chunks of ``content``, recording the statements each one runs; log when done."""
+        iterator = iter(content)
+        try:
+            while True:
+                with recorder.install():
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        return
+                yield chunk
+        finally:
+            self.log(request, response, recorder, started)
+
+    def log(self, request, response, recorder, started):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration_ms, 1),
+            'total_ms': round((time.perf_counter() - started) * 1000, 1),
+            'slowest': recorder.slowest(),
+        }
+        over = recorder.count > settings.SQL_WARN_QUERIES or recorder.duration_ms > settings.SQL_WARN_MS
+        logger.log(logging.WARNING if over else logging.INFO, json.dumps(record), extra={'sql': record})
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 05:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_assignment_lecturer_alter_assignment_student'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', '-gpa', 'matric_number'], name='student_rank_key_idx'),
+        ),
+    ]
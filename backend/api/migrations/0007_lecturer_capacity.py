@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_student_rank_key_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecturer',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
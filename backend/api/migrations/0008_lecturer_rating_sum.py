@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 06:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, Count, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Lecturer = apps.get_model('api', 'Lecturer')
+    LecturerRating = apps.get_model('api', 'LecturerRating')
+
+    ratings = LecturerRating.objects.filter(lecturer=OuterRef('pk')).order_by().values('lecturer')
+    total = Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), 0)
+    count = Coalesce(Subquery(ratings.annotate(count=Count('pk')).values('count')), 0)
+    Lecturer.objects.update(
+        rating_sum=total,
+        rating_count=count,
+        # Average rounded half up to 0.01, as api.ratings.average_for does
+        average_rating=Case(
+            When(GreaterThan(count, 0), then=(200 * total + count) / (2 * count) * Value(Decimal('0.01'))),
+            default=Value(Decimal('0.00')),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_lecturer_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecturer',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
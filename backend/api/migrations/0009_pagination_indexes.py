@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 06:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_lecturer_rating_sum'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lecturer',
+            index=models.Index(fields=['-average_rating', 'id'], name='lecturer_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturerrating',
+            index=models.Index(fields=['lecturer', 'id'], name='rating_lecturer_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', 'rank', 'id'], name='student_page_idx'),
+        ),
+    ]
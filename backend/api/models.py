@@ -1,9 +1,10 @@
-from django.db import models
-from django.db.models import F, Window, Avg, Count
-from django.db.models.functions import DenseRank
+from django.db import models, transaction
+from django.db.models import Count, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from userauths.models import User
 
+from . import ranking, ratings
+
 # Model representing a student
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='student')
@@ -12,32 +13,43 @@ class Student(models.Model):
     gpa = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     rank = models.IntegerField(default=0, null=True, blank=True)
 
-    # Method to update the rank of the student
-    def update_rank(self):
-        students = Student.objects.annotate(
-            computed_rank=Window(
-                expression=DenseRank(),
-                order_by=[F('gpa').desc(), F('matric_number').asc()]
-            )
-        ).filter(department=self.department)
+    # Fields that decide a student's position in the department ranking
+    RANK_KEY_FIELDS = ('gpa', 'matric_number', 'department')
 
-        bulk_updates = []
-        for student in students:
-            student.rank = student.computed_rank
-            bulk_updates.append(student)
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', '-gpa', 'matric_number'], name='student_rank_key_idx'),
+            # Keyset pagination order of the student list
+            models.Index(fields=['department', 'rank', 'id'], name='student_page_idx'),
+        ]
 
-        Student.objects.bulk_update(bulk_updates, ['rank'])
+    # Method to check whether this student has rated a lecturer
+    def has_rated_lecturer(self, lecturer_id):
+        return self.given_ratings.filter(lecturer_id=lecturer_id).exists()
 
-    # Override save method to update rank if GPA changes
+    # Method to recompute the rank of every student in this department
+    def update_rank(self):
+        return ranking.recompute_department(self.department)
+
+    # Override save method to shift ranks incrementally when the ranking key changes
     def save(self, *args, **kwargs):
-        old_gpa = None
+        previous = None
         if self.pk:
-            old_gpa = Student.objects.get(pk=self.pk).gpa
+            previous = Student.objects.filter(pk=self.pk).values('rank', *self.RANK_KEY_FIELDS).first()
+        if previous is not None:
+            # Ranks are owned by the ranking engine; never write back a stale value
+            self.rank = previous['rank']
 
         super().save(*args, **kwargs)
 
-        if old_gpa is None or old_gpa != self.gpa:
-            self.update_rank()
+        if previous is None:
+            self.rank_rows_touched = ranking.insert_student(self)
+        elif any(previous[field] != getattr(self, field) for field in self.RANK_KEY_FIELDS):
+            self.rank_rows_touched = ranking.move_student(
+                self, previous['gpa'], previous['matric_number'], previous['department']
+            )
+        else:
+            self.rank_rows_touched = 0
 
     def __str__(self):
         return f"{self.matric_number} - {self.user.full_name}"
@@ -47,13 +59,26 @@ class Lecturer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='lecturer')
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     rating_count = models.IntegerField(default=0)
+    # Running total of every rating received, kept in step with rating_count
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Maximum number of students to supervise; blank means an even share
+    capacity = models.PositiveIntegerField(null=True, blank=True)
 
-    # Method to update the ratings of the lecturer
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the lecturer list
+            models.Index(fields=['-average_rating', 'id'], name='lecturer_page_idx'),
+        ]
+
+    # Method to recompute the ratings of the lecturer from scratch. Rating
+    # writes keep the counters up to date on their own (see api.ratings);
+    # this is for repairs.
     def update_ratings(self):
-        aggregated_data = self.ratings.aggregate(avg_rating=Avg('rating'), total_ratings=Count('rating'))
+        aggregated_data = self.ratings.aggregate(rating_total=Sum('rating'), total_ratings=Count('rating'))
+        self.rating_sum = aggregated_data['rating_total'] or 0
         self.rating_count = aggregated_data['total_ratings']
-        self.average_rating = aggregated_data['avg_rating'] or 0
-        self.save(update_fields=['average_rating', 'rating_count'])
+        self.average_rating = ratings.average_for(self.rating_sum, self.rating_count)
+        self.save(update_fields=['average_rating', 'rating_count', 'rating_sum'])
 
     def __str__(self):
         return f"{self.user.full_name}"
@@ -70,9 +95,37 @@ class LecturerRating(models.Model):
 
     class Meta:
         unique_together = ['student', 'lecturer']
+        indexes = [
+            # Keyset pagination order of a lecturer's ratings
+            models.Index(fields=['lecturer', 'id'], name='rating_lecturer_page_idx'),
+        ]
         verbose_name = "Lecturer Rating"
         verbose_name_plural = "Lecturer Ratings"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the lecturer's counters include for this rating so a
+        # later save or delete can adjust them by the difference
+        loaded = dict(zip(field_names, values))
+        if 'lecturer_id' in loaded and 'rating' in loaded:
+            instance._counted = (loaded['lecturer_id'], loaded['rating'])
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The counters are adjusted by the difference from the stored row, so
+        # read it under a lock in the same transaction as the write
+        with transaction.atomic():
+            ratings.lock(self)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if not ratings.lock(self):
+                # Already deleted elsewhere, and already taken off the counters
+                return 0, {}
+            return super().delete(*args, **kwargs)
+
 # Model representing an assignment given to a student by a lecturer
 class Assignment(models.Model):
     student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name="student_assignments")
@@ -84,3 +137,11 @@ class Assignment(models.Model):
 
     def __str__(self):
         return f"{self.student.user.full_name} -> {self.lecturer.user.full_name}"
+
+# Change counter of an API resource, for conditional GETs (see api.versions)
+class ResourceVersion(models.Model):
+    resource = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
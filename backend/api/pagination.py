@@ -0,0 +1,217 @@
+"""
+Keyset (cursor) pagination.
+
+A page is fetched with a ``WHERE`` on the ordering key of the last row the
+client saw instead of an ``OFFSET``, so page 1000 costs the same as page 1
+when an index covers the ordering. The cursor is an opaque token holding
+that key; rows inserted or deleted while a client pages through do not
+make it skip or repeat others.
+
+Nullable key fields (such as ``Student.rank`` before a student is ranked)
+sort after every value, ``NULLS LAST``, and the cursor compares them with
+``IS NULL`` rather than ``=``, so such rows are neither dropped nor
+repeated.
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _field_value(obj, name):
+    if isinstance(obj, dict):  # rows from values()
+        return obj[name]
+    for part in name.split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _encode_value(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _is_nullable(model, name):
+    """Whether the model field ``name`` (``__`` paths included) can be null."""
+    opts = model._meta
+    for part in name.split('__'):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return False  # pk or an annotation
+        if field.null:
+            return True
+        if not field.is_relation:
+            return False
+        opts = field.related_model._meta
+    return False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate a queryset on the view's ``keyset_ordering``, a tuple of field
+    names (``-`` for descending) whose last entry must be unique, such as
+    ``('department', 'rank', 'id')``. Null values of nullable key fields
+    sort last.
+
+    The response carries ``next`` and ``previous`` links; ``page_size`` can
+    be lowered or raised up to ``max_page_size`` from the query string.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page_rows(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, reading the page with ``async for``."""
+        return self.page_rows([row async for row in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """The query for the requested page plus one row, which tells whether there is a next page."""
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', ('pk',)))
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = [self._reverse(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        nullable = [_is_nullable(queryset.model, field.lstrip('-')) for field in ordering]
+        # Going backwards the nulls come first
+        nulls_last = not self.reverse
+        queryset = queryset.order_by(*(
+            self._order_by(field, nulls_last) if null else field for field, null in zip(ordering, nullable)
+        ))
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, self.position, nullable, nulls_last))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+
+    def page_rows(self, rows):
+        """Trim the rows read from page_queryset() to the page and note the keys for the links."""
+        position, reverse = self.position, self.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_key = self._key(rows[0]) if rows else None
+        self.last_key = self._key(rows[-1]) if rows else None
+        # An empty page reached backwards still leads forward to where it started
+        if not rows and position is not None:
+            self.first_key = self.last_key = position
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor(self.last_key, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self.encode_cursor(self.first_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        """Return ``(key, reverse)`` from the request's cursor, or ``(None, False)`` without one."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            position, reverse = data['k'], bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, key, reverse):
+        data = {'k': [_encode_value(value) for value in key]}
+        if reverse:
+            data['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def _key(self, obj):
+        return [_field_value(obj, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _order_by(field, nulls_last):
+        expression = F(field.lstrip('-'))
+        order = expression.desc if field.startswith('-') else expression.asc
+        return order(nulls_last=True) if nulls_last else order(nulls_first=True)
+
+    @staticmethod
+    def _after(ordering, position, nullable, nulls_last):
+        """
+        Filter for rows strictly after ``position`` in ``ordering``:
+        ``a >= x AND ((a > x) OR (a = x AND b > y) OR ...)``, with ``<`` for
+        descending fields. The redundant bound on the leading field lets the
+        database seek into the index instead of scanning it from the start.
+
+        On a nullable field, ``a > x`` also takes in the nulls when they sort
+        last, ``a > NULL`` is every non-null value when they sort first (and
+        nothing when they sort last), and ``a = NULL`` is ``a IS NULL``.
+        """
+        condition = Q(pk__in=[])
+        equal = {}
+        for field, value, null in zip(ordering, position, nullable):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            if value is None:
+                if not nulls_last:
+                    condition |= Q(**equal, **{f'{name}__isnull': False})
+                equal[f'{name}__isnull'] = True
+                continue
+            after = Q(**{f'{name}__{lookup}': value})
+            if null and nulls_last:
+                after |= Q(**{f'{name}__isnull': True})
+            condition |= Q(**equal) & after
+            equal[name] = value
+        first = ordering[0]
+        if nullable[0]:
+            return condition
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & condition
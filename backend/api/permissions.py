@@ -1,18 +1,43 @@
 from rest_framework import permissions
 
+from userauths.authentication import ClaimsUser
+
+
+
+def student_pk(user):
+    """
+    The id of the user's student profile, or None. Read from the token's
+    claims for a ClaimsUser, otherwise from the profile itself.
+    """
+    if not user or not user.is_authenticated:
+        return None
+    if isinstance(user, ClaimsUser):
+        return user.student_id
+    student = getattr(user, 'student', None)
+    return student.pk if student is not None else None
+
+def lecturer_pk(user):
+    """The id of the user's lecturer profile, or None; see student_pk."""
+    if not user or not user.is_authenticated:
+        return None
+    if isinstance(user, ClaimsUser):
+        return user.lecturer_id
+    lecturer = getattr(user, 'lecturer', None)
+    return lecturer.pk if lecturer is not None else None
+
 class IsStudent(permissions.BasePermission):
     """
     Allows access only to students.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'student')
+        return student_pk(request.user) is not None
 
 class IsLecturer(permissions.BasePermission):
     """
     Allows access only to lecturers.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'lecturer')
+        return lecturer_pk(request.user) is not None
     
 class IsAdminOrStudent(permissions.BasePermission):
     """
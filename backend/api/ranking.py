@@ -0,0 +1,199 @@
+"""
+Incremental maintenance of ``Student.rank``.
+
+Ranks are positions inside a department, ordered by GPA (highest first) with
+the matric number breaking ties, so every student in a department holds a
+distinct rank from 1 to N. A single change only moves the students sitting
+between the old and the new position by one, so instead of rewriting the
+whole department we shift that range with one UPDATE.
+
+Every function returns the number of rows it wrote so callers can check that
+a change stays far below the size of the department.
+
+A change counts the students ahead of the new position before it shifts
+anyone, so the incremental functions first take the department's lock (see
+:func:`lock_departments`); two changes in one department never interleave.
+"""
+import logging
+
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+
+logger = logging.getLogger(__name__)
+
+# First key of the PostgreSQL advisory locks taken by lock_departments, so
+# they cannot collide with advisory locks taken for anything else
+ADVISORY_LOCK_CLASS = 7361
+
+
+def _student_model():
+    from .models import Student
+    return Student
+
+
+def ahead_of(gpa, matric_number):
+    """Filter matching the students that sort ahead of ``(gpa, matric_number)``."""
+    return Q(gpa__gt=gpa) | Q(gpa=gpa, matric_number__lt=matric_number)
+
+
+def lock_departments(*departments):
+    """
+    Serialise rank changes in ``departments`` until the current transaction
+    ends. Must be called inside a transaction.
+
+    PostgreSQL takes a transaction-level advisory lock per department, which
+    also covers a department nobody is in yet. Other databases with row
+    locks lock the department's student rows. SQLite needs neither: it runs
+    one write transaction at a time, and one whose reads were overtaken by
+    another's write fails instead of writing stale ranks. Departments are
+    locked in sorted order so that two moves cannot deadlock.
+    """
+    Student = _student_model()
+    connection = connections[router.db_for_write(Student)]
+    for department in sorted(set(departments)):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', [ADVISORY_LOCK_CLASS, department])
+        elif connection.features.has_select_for_update:
+            list(Student.objects.select_for_update().filter(department=department).values_list('pk', flat=True))
+
+
+def position_for(department, gpa, matric_number, exclude_pk=None):
+    """Return the rank a student with this key holds inside ``department``."""
+    students = _student_model().objects.filter(department=department).filter(ahead_of(gpa, matric_number))
+    if exclude_pk is not None:
+        students = students.exclude(pk=exclude_pk)
+    return students.count() + 1
+
+
+# One set-based UPDATE that numbers the department and writes only changed rows.
+# UPDATE ... FROM is understood by PostgreSQL and by SQLite 3.33+.
+RECOMPUTE_SQL = """
+    UPDATE {table} SET {rank} = ranked.position
+    FROM (
+        SELECT {pk} AS student_id,
+               ROW_NUMBER() OVER (ORDER BY {gpa} DESC, {matric_number} ASC) AS position
+        FROM {table}
+        WHERE {department} = %s
+    ) AS ranked
+    WHERE {table}.{pk} = ranked.student_id
+      AND ({table}.{rank} IS NULL OR {table}.{rank} <> ranked.position)
+"""
+
+
+def _supports_update_from(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 33, 0)
+    return False
+
+
+def recompute_department(department):
+    """
+    Recompute every rank in ``department`` from scratch.
+
+    Runs as a single window-function UPDATE where the database supports it;
+    otherwise reads the department once in rank order and bulk-updates the
+    rows whose rank changed. Either way only changed rows are written.
+    """
+    Student = _student_model()
+    connection = connections[router.db_for_write(Student)]
+
+    if _supports_update_from(connection):
+        qn = connection.ops.quote_name
+        opts = Student._meta
+        sql = RECOMPUTE_SQL.format(
+            table=qn(opts.db_table),
+            pk=qn(opts.pk.column),
+            **{name: qn(opts.get_field(name).column) for name in ('rank', 'gpa', 'matric_number', 'department')},
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [department])
+            touched = cursor.rowcount
+    else:
+        rows = (
+            Student.objects.filter(department=department)
+            .order_by('-gpa', 'matric_number')
+            .values_list('pk', 'rank')
+        )
+        changed = [
+            Student(pk=pk, rank=position)
+            for position, (pk, rank) in enumerate(rows.iterator(chunk_size=2000), start=1)
+            if rank != position
+        ]
+        Student.objects.bulk_update(changed, ['rank'], batch_size=1000)
+        touched = len(changed)
+
+    logger.debug("Recomputed ranks in %s: %d rows touched", department, touched)
+    return touched
+
+
+def insert_student(student):
+    """Open a slot for a student that just joined ``student.department``."""
+    Student = _student_model()
+    with transaction.atomic():
+        lock_departments(student.department)
+        rank = position_for(student.department, student.gpa, student.matric_number, exclude_pk=student.pk)
+        shifted = (
+            Student.objects.filter(department=student.department)
+            .exclude(pk=student.pk)
+            .exclude(ahead_of(student.gpa, student.matric_number))
+            .update(rank=F('rank') + 1)
+        )
+        Student.objects.filter(pk=student.pk).update(rank=rank)
+    student.rank = rank
+    logger.debug("Inserted %s at rank %d in %s: %d rows touched",
+                 student.pk, rank, student.department, shifted + 1)
+    return shifted + 1
+
+
+def remove_student(department, gpa, matric_number):
+    """
+    Close the slot left by a student that is no longer in ``department``.
+
+    The students behind the removed key move up by one. Working from the key
+    rather than the stored rank keeps this correct when several students of
+    one department are deleted in a single cascade.
+    """
+    with transaction.atomic():
+        lock_departments(department)
+        shifted = (
+            _student_model().objects.filter(department=department)
+            .exclude(ahead_of(gpa, matric_number))
+            .update(rank=F('rank') - 1)
+        )
+    logger.debug("Removed %s from %s: %d rows touched", matric_number, department, shifted)
+    return shifted
+
+
+def move_student(student, old_gpa, old_matric_number, old_department):
+    """
+    Move ``student`` from its previous key to its current one.
+
+    Only the students whose key lies between the old and the new position
+    are shifted, so the cost is proportional to how far the student moved.
+    """
+    Student = _student_model()
+    with transaction.atomic():
+        lock_departments(old_department, student.department)
+        if old_department != student.department:
+            touched = remove_student(old_department, old_gpa, old_matric_number)
+            return touched + insert_student(student)
+
+        new_ahead = ahead_of(student.gpa, student.matric_number)
+        old_ahead = ahead_of(old_gpa, old_matric_number)
+        others = Student.objects.filter(department=student.department).exclude(pk=student.pk)
+
+        rank = position_for(student.department, student.gpa, student.matric_number, exclude_pk=student.pk)
+        # Moving up pushes everyone between the new and old key down a place,
+        # moving down pulls them up; at most one of these ranges is non-empty.
+        shifted = others.filter(old_ahead).exclude(new_ahead).update(rank=F('rank') + 1)
+        shifted += others.filter(new_ahead).exclude(old_ahead).update(rank=F('rank') - 1)
+        Student.objects.filter(pk=student.pk).update(rank=rank)
+
+    student.rank = rank
+    logger.debug("Moved %s to rank %d in %s: %d rows touched",
+                 student.pk, rank, student.department, shifted + 1)
+    return shifted + 1
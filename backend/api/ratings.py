@@ -0,0 +1,228 @@
+"""
+Running rating aggregates on ``Lecturer``.
+
+Each lecturer keeps ``rating_sum`` and ``rating_count`` next to
+``average_rating``. A rating write adjusts them by its delta with a single
+UPDATE built from ``F()`` expressions, so the cost does not depend on how
+many ratings the lecturer already has and concurrent submissions cannot
+lose an update. :func:`upsert` saves a student's ratings of many lecturers
+in a handful of statements, and :func:`verify` checks the counters against
+the real aggregate.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+
+def _lecturer_model():
+    from .models import Lecturer
+    return Lecturer
+
+
+def _student_model():
+    from .models import Student
+    return Student
+
+
+def _rating_model():
+    from .models import LecturerRating
+    return LecturerRating
+
+
+def average_for(total, count):
+    """The average of ``count`` ratings adding up to ``total``, rounded half up to 0.01."""
+    if not count:
+        return Decimal('0.00')
+    return Decimal((200 * total + count) // (2 * count)) / 100
+
+
+def average_expression(total, count):
+    """
+    :func:`average_for` as a database expression over ``total`` and ``count``.
+
+    The rounding is done in integer arithmetic so the database and Python
+    agree to the last digit.
+    """
+    return Case(
+        When(GreaterThan(count, 0), then=(200 * total + count) / (2 * count) * Value(Decimal('0.01'))),
+        default=Value(Decimal('0.00')),
+    )
+
+
+def _add(lecturers, total_delta, count_delta):
+    # The new average is computed from the old counters plus the deltas
+    # rather than from the columns being assigned, since SET clauses see the
+    # row as it was before the statement.
+    total = F('rating_sum') + total_delta
+    count = F('rating_count') + count_delta
+    return lecturers.update(
+        rating_sum=total,
+        rating_count=count,
+        average_rating=average_expression(total, count),
+    )
+
+
+def apply_delta(lecturer_id, total_delta, count_delta):
+    """
+    Add ``total_delta`` to a lecturer's rating sum and ``count_delta`` to the
+    rating count, and refresh the average, in one UPDATE. Returns the number
+    of rows written.
+    """
+    versions.bump(versions.lecturer(lecturer_id))
+    return _add(_lecturer_model().objects.filter(pk=lecturer_id), total_delta, count_delta)
+
+
+def apply_deltas(deltas):
+    """
+    :func:`apply_delta` for many lecturers at once: ``deltas`` maps lecturer
+    ids to ``(total_delta, count_delta)`` and every lecturer is updated by
+    the same single UPDATE.
+    """
+    if not deltas:
+        return 0
+    versions.bump(*(versions.lecturer(lecturer_id) for lecturer_id in deltas))
+
+    def per_lecturer(position):
+        return Case(
+            *(When(pk=lecturer_id, then=Value(delta[position])) for lecturer_id, delta in deltas.items()),
+            default=Value(0),
+        )
+
+    return _add(_lecturer_model().objects.filter(pk__in=deltas), per_lecturer(0), per_lecturer(1))
+
+
+def lock(rating):
+    """
+    Lock a ``LecturerRating`` before it is saved or deleted, inside the
+    transaction that writes it, and re-read what its lecturer's counters
+    currently include for it. Returns False when the row does not exist.
+
+    The student's row is locked first, as :func:`upsert` does, so a
+    student's single and bulk rating writes are serialized; the rating's
+    own row is locked by the re-read. The values the instance was loaded
+    with may be stale by then, so they are replaced by the current ones.
+    """
+    list(_student_model().objects.select_for_update().filter(pk=rating.student_id).values_list('pk', flat=True))
+    current = None
+    if rating.pk is not None:
+        current = (
+            _rating_model().objects.select_for_update().filter(pk=rating.pk)
+            .values_list('lecturer_id', 'rating').first()
+        )
+    rating._counted = current
+    return current is not None
+
+
+def rating_saved(rating, created):
+    """
+    Fold a saved ``LecturerRating`` into its lecturer's counters.
+
+    Updates use the difference from the values re-read under :func:`lock`
+    (or those the rating was loaded with, see ``LecturerRating.from_db``,
+    when saved without it); a rating moved to another lecturer is
+    taken off the old one and added to the new one. When those values are
+    unknown the lecturer is re-aggregated instead.
+    """
+    counted = getattr(rating, '_counted', None)
+    if created:
+        apply_delta(rating.lecturer_id, rating.rating, 1)
+    elif counted is None:
+        rating.lecturer.update_ratings()
+    else:
+        old_lecturer_id, old_rating = counted
+        if old_lecturer_id != rating.lecturer_id:
+            apply_delta(old_lecturer_id, -old_rating, -1)
+            apply_delta(rating.lecturer_id, rating.rating, 1)
+        elif old_rating != rating.rating:
+            apply_delta(rating.lecturer_id, rating.rating - old_rating, 0)
+    rating._counted = (rating.lecturer_id, rating.rating)
+
+
+def rating_deleted(rating):
+    """Take a deleted ``LecturerRating`` off its lecturer's counters."""
+    lecturer_id, value = getattr(rating, '_counted', None) or (rating.lecturer_id, rating.rating)
+    apply_delta(lecturer_id, -value, -1)
+
+
+def existing_ratings(student_id, lecturer_ids):
+    """The student's current ratings of ``lecturer_ids``, as ``{lecturer_id: rating}``."""
+    return dict(
+        _rating_model().objects.filter(student_id=student_id, lecturer_id__in=lecturer_ids)
+        .values_list('lecturer_id', 'rating')
+    )
+
+
+def upsert(student_id, values):
+    """
+    Save one student's ratings of several lecturers; ``values`` maps lecturer
+    ids to ratings. Returns the saved ``LecturerRating`` objects.
+
+    Inside one transaction the student's row is locked, where the database
+    supports it, and their existing ratings of those lecturers are read;
+    every rating is then inserted or updated by a single
+    ``INSERT ... ON CONFLICT`` and the lecturers' counters are adjusted by
+    one UPDATE. Locking the student rather than the ratings serializes a
+    student's concurrent submissions even when the ratings do not exist yet,
+    so two first-time ratings of one lecturer cannot both be counted as new.
+    The upsert bypasses the model signals, so nothing is counted twice.
+    """
+    with transaction.atomic():
+        list(_student_model().objects.select_for_update().filter(pk=student_id).values_list('pk', flat=True))
+        previous = existing_ratings(student_id, values)
+        LecturerRating = _rating_model()
+        saved = LecturerRating.objects.bulk_create(
+            [
+                LecturerRating(student_id=student_id, lecturer_id=lecturer_id, rating=rating)
+                for lecturer_id, rating in values.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'lecturer'],
+            update_fields=['rating', 'updated_at'],
+        )
+        deltas = {}
+        for lecturer_id, rating in values.items():
+            if lecturer_id not in previous:
+                deltas[lecturer_id] = (rating, 1)
+            elif previous[lecturer_id] != rating:
+                deltas[lecturer_id] = (rating - previous[lecturer_id], 0)
+        apply_deltas(deltas)
+        versions.bump(versions.RATINGS, versions.LECTURERS)
+    return saved
+
+
+def verify(fix=False):
+    """
+    Compare every lecturer's counters with the real aggregate of their ratings.
+
+    Returns a list of ``{"lecturer", "stored", "actual"}`` dicts, each side a
+    ``(rating_sum, rating_count, average_rating)`` tuple, for the lecturers
+    that disagree. With ``fix`` those lecturers are re-aggregated.
+    """
+    Lecturer = _lecturer_model()
+    rows = Lecturer.objects.annotate(
+        actual_sum=Coalesce(Sum('ratings__rating'), 0),
+        actual_count=Count('ratings'),
+    ).values_list('pk', 'rating_sum', 'rating_count', 'average_rating', 'actual_sum', 'actual_count')
+
+    mismatches = []
+    for pk, rating_sum, rating_count, average_rating, actual_sum, actual_count in rows.iterator(chunk_size=2000):
+        stored = (rating_sum, rating_count, average_rating)
+        actual = (actual_sum, actual_count, average_for(actual_sum, actual_count))
+        if stored != actual:
+            mismatches.append({"lecturer": pk, "stored": stored, "actual": actual})
+
+    if fix:
+        for lecturer in Lecturer.objects.filter(pk__in=[mismatch["lecturer"] for mismatch in mismatches]):
+            lecturer.update_ratings()
+    if mismatches:
+        logger.warning("%d lecturer rating aggregate(s) out of date%s",
+                       len(mismatches), "; fixed" if fix else "")
+    return mismatches
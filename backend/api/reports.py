@@ -0,0 +1,182 @@
+"""
+Background PDF reports of assignments.
+
+Building a PDF of thousands of assignments takes longer than an admin
+request should, so reports are built on a background thread and stored under
+``REPORT_ROOT``, which is not served publicly: reports are downloaded only
+through the admin's report view. A report's file name is derived from the
+selected assignments and the current data versions (see :mod:`api.versions`),
+so asking again for an unchanged report serves the stored file at once,
+and any change to assignments, students or lecturers leads to a new one.
+
+Everything about a report is kept on disk, so every worker process sees
+the same state: a report is ready once its PDF exists, and is being built
+while its ``.pending`` marker exists. The marker is created exclusively, so
+only one process builds a given report.
+
+Rows are read with the same single joined query as the CSV export and laid
+out as a series of tables of ``ROWS_PER_TABLE`` rows instead of one huge
+table, which reportlab splits across pages much faster.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import versions
+from .exports import EXPORT_HEADER, assignment_rows
+
+logger = logging.getLogger(__name__)
+
+ROWS_PER_TABLE = 500
+
+# Stored reports older than this are deleted when a new one is started
+REPORT_MAX_AGE = 7 * 24 * 3600
+
+# A build whose marker is older than this is taken to have died with its process
+REPORT_BUILD_TIMEOUT = 3600
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),       # Header background
+    ('TEXTCOLOR',   (0, 0), (-1, 0), colors.whitesmoke),# Header text color
+    ('ALIGN',       (0, 0), (-1, -1), 'LEFT'),          # Align text to left
+    ('GRID',        (0, 0), (-1, -1), 1, colors.black), # Grid lines
+    ('FONTNAME',    (0, 0), (-1, 0), 'Helvetica-Bold'), # Header font
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),             # Extra space in header
+])
+
+def report_key(queryset):
+    """Identify the report of ``queryset`` as it stands now."""
+    digest = hashlib.sha1()
+    for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=5000):
+        digest.update(b'%d,' % pk)
+    current = versions.current((versions.ASSIGNMENTS, versions.STUDENTS, versions.LECTURERS))
+    digest.update(repr(sorted(current.items())).encode())
+    return digest.hexdigest()[:32]
+
+
+def report_path(key):
+    if not KEY_PATTERN.fullmatch(key):
+        raise ValueError(f"Not a report key: {key!r}")
+    return Path(settings.REPORT_ROOT) / f'assignments-{key}.pdf'
+
+
+def _marker_path(key):
+    return report_path(key).with_suffix('.pending')
+
+
+def is_ready(key):
+    return KEY_PATTERN.fullmatch(key) is not None and report_path(key).exists()
+
+
+def is_running(key):
+    if KEY_PATTERN.fullmatch(key) is None:
+        return False
+    try:
+        return time.time() - _marker_path(key).stat().st_mtime < REPORT_BUILD_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+def file_response(key):
+    return FileResponse(open(report_path(key), 'rb'), as_attachment=True, filename='assignments.pdf')
+
+
+def _claim(key):
+    """Create the build marker of ``key``; False if another build holds it."""
+    marker = _marker_path(key)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    if marker.exists() and not is_running(key):
+        # Left behind by a build that died
+        marker.unlink(missing_ok=True)
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+def start(key, queryset):
+    """Build the report of ``queryset`` under ``key`` on a background thread, unless it exists or is underway."""
+    if is_ready(key) or not _claim(key):
+        return
+    prune()
+    threading.Thread(target=_build_job, args=(key, queryset), name=f'report-{key}', daemon=True).start()
+
+
+def _build_job(key, queryset):
+    started = time.monotonic()
+    try:
+        rows = build_pdf(assignment_rows(queryset), report_path(key))
+        logger.info("Built assignment report %s: %d rows in %.1fs", key, rows, time.monotonic() - started)
+    except Exception:
+        logger.exception("Building assignment report %s failed", key)
+    finally:
+        _marker_path(key).unlink(missing_ok=True)
+        connection.close()
+
+
+def _table(rows):
+    table = Table([EXPORT_HEADER] + rows, colWidths=[150, 150, 150], repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def build_pdf(rows, path):
+    """
+    Write a PDF report of ``rows`` to ``path`` and return the number of rows.
+
+    The file is written under a temporary name and moved into place when
+    complete, so a reader never sees half a report.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.part')
+    doc = SimpleDocTemplate(str(partial), pagesize=letter, leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=50)
+
+    elements = [Paragraph("Assignments Report", getSampleStyleSheet()['Title']), Spacer(1, 20)]
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= ROWS_PER_TABLE:
+            elements.append(_table(chunk))
+            count += len(chunk)
+            chunk = []
+    if chunk or not count:
+        elements.append(_table(chunk))
+        count += len(chunk)
+
+    try:
+        doc.build(elements)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return count
+
+
+def prune(max_age=REPORT_MAX_AGE):
+    """Delete stored reports older than ``max_age`` seconds."""
+    directory = Path(settings.REPORT_ROOT)
+    if not directory.is_dir():
+        return
+    cutoff = time.time() - max_age
+    for path in directory.glob('assignments-*.pdf'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
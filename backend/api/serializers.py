@@ -1,5 +1,8 @@
+from django.db.models import F
 from rest_framework import serializers
 from .models import Student, Lecturer, LecturerRating, Assignment
+from .permissions import student_pk
+from .ratings import upsert as upsert_ratings
 from userauths.models import User
 
 class UserDetailsSerializer(serializers.ModelSerializer):
@@ -23,6 +26,9 @@ class StudentSerializer(serializers.ModelSerializer):
     def get_has_rated(self, obj):
         lecturer_id = self.context.get('lecturer_id')
         if lecturer_id:
+            # List views annotate the whole page at once (see HasRatedMixin)
+            if hasattr(obj, 'has_rated'):
+                return obj.has_rated
             return obj.has_rated_lecturer(lecturer_id)
         return False
 
@@ -38,7 +44,7 @@ class LecturerSerializer(serializers.ModelSerializer):
         model = Lecturer
         fields = [
             'id', 'user', 'average_rating',
-            'rating_count'
+            'rating_count', 'capacity'
         ]
         read_only_fields = ['average_rating', 'rating_count']
 
@@ -74,34 +80,71 @@ class AssignmentSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ['assigned_date']
 
+# Read-only flat form of an assignment, built straight from one values()
+# query joined across student, lecturer and both users: no model instances
+# and no per-field serializer work. Besides id, assigned_date, student_id
+# and lecturer_id, keys are output names and values the lookups they are
+# read from.
+FLAT_ASSIGNMENT_FIELDS = {
+    'matric_number': F('student__matric_number'),
+    'student_name': F('student__user__full_name'),
+    'student_email': F('student__user__email'),
+    'department': F('student__department'),
+    'gpa': F('student__gpa'),
+    'rank': F('student__rank'),
+    'lecturer_name': F('lecturer__user__full_name'),
+    'lecturer_email': F('lecturer__user__email'),
+    'average_rating': F('lecturer__average_rating'),
+}
+
+def flat_assignment_rows(queryset):
+    """Turn an Assignment queryset into dicts of FLAT_ASSIGNMENT_FIELDS."""
+    return queryset.values('id', 'assigned_date', 'student_id', 'lecturer_id', **FLAT_ASSIGNMENT_FIELDS)
+
+def flat_assignment_data(rows):
+    """Format decimals and dates the way the nested serializers do."""
+    date_field = serializers.DateTimeField()
+    for row in rows:
+        row['assigned_date'] = date_field.to_representation(row['assigned_date'])
+        row['gpa'] = str(row['gpa'])
+        row['average_rating'] = str(row['average_rating'])
+    return rows
+
 class LecturerRatingBulkItemSerializer(serializers.ModelSerializer):
+    # The lecturer ID; all IDs in a payload are checked together in
+    # BulkLecturerRatingCreateSerializer.validate rather than one query each
+    lecturer = serializers.IntegerField()
+
     class Meta:
         model = LecturerRating
         fields = ['lecturer', 'rating']
-        # lecturer is expected to be the lecturer ID
 
 class BulkLecturerRatingCreateSerializer(serializers.Serializer):
     ratings = LecturerRatingBulkItemSerializer(many=True)
 
     def create(self, validated_data):
         ratings_data = validated_data.pop('ratings')
-        student = self.context['request'].user.student
-        created_ratings = []
-        for item in ratings_data:
-            lecturer = item['lecturer']
-            rating_value = item['rating']
-            # Use update_or_create to update if exists or create if not.
-            obj, created = LecturerRating.objects.update_or_create(
-                student=student,
-                lecturer=lecturer,
-                defaults={'rating': rating_value}
-            )
-            created_ratings.append(obj)
-        return created_ratings
+        student_id = student_pk(self.context['request'].user)
+        # One upsert for every rating, then one update of the lecturers' aggregates
+        return upsert_ratings(student_id, {item['lecturer']: item['rating'] for item in ratings_data})
 
     def validate(self, attrs):
         # Validate that there are no duplicate lecturer entries in the payload.
         lecturers = [item['lecturer'] for item in attrs.get('ratings', [])]
         if len(lecturers) != len(set(lecturers)):
             raise serializers.ValidationError("Duplicate lecturer entries are not allowed.")
-        return attrs
\ No newline at end of file
+        unknown = set(lecturers) - set(Lecturer.objects.filter(pk__in=lecturers).values_list('pk', flat=True))
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown lecturer ID(s): {', '.join(str(pk) for pk in sorted(unknown))}."
+            )
+        return attrs
+
+
+class RunAssignmentsSerializer(serializers.Serializer):
+    # Options for run_assignments. BooleanField reads "false", "0" and "off"
+    # as False, from JSON bodies and query strings alike
+    strategy = serializers.CharField(default='round_robin')
+    by_department = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+    only_unassigned = serializers.BooleanField(default=False)
@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from userauths.models import User
-from .models import LecturerRating, Student, Lecturer
+from .models import Assignment, LecturerRating, Student, Lecturer
+from . import ranking, ratings, versions
 
 @receiver(post_save, sender=User)
 def assign_user_profile(sender, instance, created, **kwargs):
@@ -15,27 +16,43 @@ def assign_user_profile(sender, instance, created, **kwargs):
             Lecturer.objects.create(user=instance)
 
 @receiver(post_save, sender=LecturerRating)
-def update_lecturer_on_save(sender, instance, **kwargs):
-    instance.lecturer.update_ratings()
+def update_lecturer_on_save(sender, instance, created, **kwargs):
+    ratings.rating_saved(instance, created)
+    versions.bump(versions.RATINGS, versions.LECTURERS)
 
 @receiver(post_delete, sender=LecturerRating)
 def update_lecturer_on_delete(sender, instance, **kwargs):
-    instance.lecturer.update_ratings()
+    ratings.rating_deleted(instance)
+    versions.bump(versions.RATINGS, versions.LECTURERS)
+
+@receiver(post_save, sender=Lecturer)
+@receiver(post_delete, sender=Lecturer)
+def bump_lecturers(sender, instance, **kwargs):
+    versions.bump(versions.LECTURERS, versions.lecturer(instance.pk))
+
+@receiver(post_save, sender=User)
+def bump_user_profiles(sender, instance, created, **kwargs):
+    # Student and lecturer responses include the user's name and email
+    if instance.role == 'student':
+        versions.bump(versions.STUDENTS)
+    elif instance.role == 'lecturer':
+        # A new user's profile is created with its own bump
+        profiles = [] if created else Lecturer.objects.filter(user=instance).values_list('pk', flat=True)
+        versions.bump(versions.LECTURERS, *(versions.lecturer(pk) for pk in profiles))
 
 @receiver(post_save, sender=Student)
-def update_student_ranks(sender, instance, created, **kwargs):
-    """
-    Signal to update student ranks when a student is saved.
-    """
-    if created:  # Only update ranks when a new student is created
-        instance.update_rank()
+def bump_students_on_save(sender, instance, **kwargs):
+    versions.bump(versions.STUDENTS)
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def bump_assignments(sender, instance, **kwargs):
+    versions.bump(versions.ASSIGNMENTS)
 
 @receiver(post_delete, sender=Student)
 def update_ranks_on_delete(sender, instance, **kwargs):
     """
-    Signal to update student ranks when a student is deleted.
+    Signal to close the rank gap left when a student is deleted.
     """
-    next_student = Student.objects.filter(department=instance.department).first()
-    
-    if next_student:  # Only update if a student exists
-        next_student.update_rank()
\ No newline at end of file
+    ranking.remove_student(instance.department, instance.gpa, instance.matric_number)
+    versions.bump(versions.STUDENTS)
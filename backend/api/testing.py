@@ -0,0 +1,111 @@
+"""
+Query budgets for tests.
+
+With SQL_QUERY_HEADERS on, every response carries the number of SQL
+statements its request ran (see api.middleware); QueryBudgetMixin turns
+it on for its tests. Streaming responses are counted once their body has
+been read, which assertQueryBudget does first. QUERY_BUDGETS caps that number per URL name, so a
+test that requests an endpoint fails on an N+1 regression instead of it
+showing up in production:
+
+    class LecturerTests(QueryBudgetMixin, APITestCase):
+        def test_list(self):
+            response = self.client.get(reverse('lecturer-list'))
+            self.assertQueryBudget(response)
+
+Budgets count every statement of the request, authentication included,
+and hold at any data size; a list endpoint that grows with its page has
+an N+1 problem. max_queries() does the same for code called directly.
+"""
+from contextlib import contextmanager
+
+from django.test.utils import override_settings
+
+from .middleware import COUNT_HEADER, QueryRecorder
+
+QUERY_BUDGETS = {
+    'user-detail': 1,
+    # Conditional GETs run one query for the version counters (see api.versions) first
+    'student-list': 2,
+    'student-detail': 2,
+    'supervisor-assigned-to-student': 1,
+    'lecturer-list': 2,
+    'lecturer-detail': 2,
+    'lecturer-ratings': 2,
+    'students-assigned-to-lecturer': 2,
+    'assignments': 2,
+    # One query, run as the response streams
+    'assignments-export-csv': 1,
+    'assignments-export-xlsx': 1,
+    'cache-stats': 0,
+    'async-student-list': 2,
+    'async-supervisor-assigned-to-student': 1,
+    'async-lecturer-list': 2,
+    'async-students-assigned-to-lecturer': 2,
+    # Writes: validation, the write itself and the lecturer's aggregates; a
+    # single rating also locks the student's row first (see api.ratings.lock)
+    'rating-create': 6,
+    'rating-bulk-create': 5,
+}
+
+
+def query_count(response):
+    """
+    The number of SQL statements the request behind ``response`` ran; for a
+    streaming response, including those run while its body was read.
+    """
+    recorder = getattr(response, 'query_recorder', None)
+    if response.streaming and recorder is not None:
+        return recorder.count
+    try:
+        return int(response[COUNT_HEADER])
+    except KeyError:
+        raise AssertionError(
+            f"Response has no {COUNT_HEADER} header; are SQL_INSTRUMENTATION and SQL_QUERY_HEADERS on?"
+        ) from None
+
+
+def _describe(recorder):
+    lines = [f"  {entry['ms']:.1f} ms: {entry['sql']}" for entry in recorder.slowest()]
+    return '\n'.join(["Slowest statements:"] + lines) if lines else ''
+
+
+@contextmanager
+def max_queries(budget):
+    """Fail with AssertionError if the block runs more than ``budget`` SQL statements."""
+    recorder = QueryRecorder(keep=5)
+    with recorder.install():
+        yield recorder
+    if recorder.count > budget:
+        raise AssertionError(f"{recorder.count} queries run, over the budget of {budget}.\n{_describe(recorder)}")
+
+
+class QueryBudgetMixin:
+    """TestCase mixin adding assertQueryBudget(); turns the query count header on."""
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        headers = override_settings(SQL_INSTRUMENTATION=True, SQL_QUERY_HEADERS=True)
+        headers.enable()
+        self.addCleanup(headers.disable)
+
+    def assertQueryBudget(self, response, budget=None):
+        """
+        Assert that the request behind ``response`` ran at most ``budget``
+        statements; by default its URL name's entry in query_budgets.
+        """
+        if budget is None:
+            name = response.resolver_match.url_name
+            if name not in self.query_budgets:
+                self.fail(f"No query budget for URL name {name!r}")
+            budget = self.query_budgets[name]
+        if response.streaming:
+            # Finish the body, so the statements it runs are counted (a no-op if read already)
+            b''.join(response.streaming_content)
+        count = query_count(response)
+        self.assertLessEqual(
+            count, budget,
+            f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} ran {count} queries, "
+            f"over its budget of {budget}."
+        )
@@ -1,3 +1,1170 @@
-from django.test import TestCase
+import csv
+import io
+import itertools
+import json
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+from userauths.models import User
+from userauths.serializers import MyTokenObtainPairSerializer
+
+from . import cache as api_cache
+from . import exports, gpa_import, matching, ranking, ratings, reports, versions
+from .assignment import run_assignments
+from .models import Assignment, Lecturer, LecturerRating, Student
+from .serializers import FLAT_ASSIGNMENT_FIELDS
+from .testing import QUERY_BUDGETS, QueryBudgetMixin, query_count
+
+
+def make_student(number, department='Computer Science', gpa='3.00'):
+    user = User.objects.create_user(
+        email=f'student{number}@example.com', full_name=f'Student {number}', role='student',
+        matric_number=f'M{number:07d}', department=department,
+    )
+    student = user.student
+    student.gpa = Decimal(gpa)
+    student.save()
+    return student
+
+
+def make_admin():
+    return User.objects.create_user(email='admin@example.com', full_name='Admin', role='admin', is_staff=True)
+
+
+def make_lecturer(number, capacity=None):
+    user = User.objects.create_user(email=f'lecturer{number}@example.com', full_name=f'Lecturer {number}',
+                                    role='lecturer')
+    lecturer = user.lecturer
+    if capacity is not None:
+        lecturer.capacity = capacity
+        lecturer.save()
+    return lecturer
+
+
+def preference_arrays(prefs):
+    """CSR arrays from one ``[(lecturer, value), ...]`` list per student, best value first."""
+    pref_start, pref_lecturer, pref_value = [0], [], []
+    for student_prefs in prefs:
+        for lecturer, value in sorted(student_prefs, key=lambda pref: -pref[1]):
+            pref_lecturer.append(lecturer)
+            pref_value.append(value)
+        pref_start.append(len(pref_lecturer))
+    return pref_start, pref_lecturer, pref_value
+
+
+def random_instance(rng, n, m):
+    capacity = [rng.randint(0, 3) for _ in range(m)]
+    capacity[0] += max(0, n - sum(capacity))
+    quality = [rng.randint(0, 5) for _ in range(m)]
+    prefs = [[(j, rng.randint(0, 10)) for j in rng.sample(range(m), rng.randint(0, m))] for _ in range(n)]
+    return capacity, quality, prefs
+
+
+class MatchingTests(SimpleTestCase):
+    def values(self, quality, prefs, band=None, band_weight=(0,), affinity=None):
+        """Every student's value for every lecturer, as the auction defines it."""
+        affinity = affinity or [0] * len(quality)
+        rows = []
+        for i, student_prefs in enumerate(prefs):
+            weight = band_weight[band[i]] if band else band_weight[0]
+            row = [q + weight * a for q, a in zip(quality, affinity)]
+            for j, value in student_prefs:
+                row[j] = value + weight * affinity[j]
+            rows.append(row)
+        return rows
+
+    def best_total(self, capacity, values):
+        """The optimum, by trying every assignment."""
+        best = None
+        for choice in itertools.product(range(len(capacity)), repeat=len(values)):
+            if all(choice.count(j) <= c for j, c in enumerate(capacity)):
+                total = sum(row[j] for row, j in zip(values, choice))
+                best = total if best is None else max(best, total)
+        return best
+
+    def assertFeasible(self, capacity, owner):
+        self.assertNotIn(matching.UNASSIGNED, owner)
+        for j, c in enumerate(capacity):
+            self.assertLessEqual(owner.count(j), c, f"lecturer {j} over capacity")
+
+    def test_auction_hand_checked(self):
+        # Both students rate lecturer 0 highest but it has one place; student 1
+        # loses less by taking lecturer 1 (8 - 7) than student 0 would (9 - 2)
+        capacity = [1, 1, 1]
+        quality = [0, 0, 1]
+        prefs = [[(0, 9), (1, 2)], [(0, 8), (1, 7)]]
+        owner, stats = matching.auction(capacity, quality, *preference_arrays(prefs))
+        self.assertEqual(owner, [0, 1])
+        self.assertTrue(stats['converged'])
+
+    def test_auction_is_optimal_on_small_instances(self):
+        rng = random.Random(5)
+        for _ in range(40):
+            n, m = rng.randint(1, 5), rng.randint(1, 3)
+            capacity, quality, prefs = random_instance(rng, n, m)
+            values = self.values(quality, prefs)
+            # Within n * epsilon of the optimum ...
+            for epsilon in (1, 3):
+                owner, _ = matching.auction(capacity, quality, *preference_arrays(prefs), epsilon=epsilon)
+                self.assertFeasible(capacity, owner)
+                total = sum(row[j] for row, j in zip(values, owner))
+                self.assertGreaterEqual(total, self.best_total(capacity, values) - n * epsilon)
+            # ... and optimal once values are scaled by n + 1
+            scaled = [[(j, value * (n + 1)) for j, value in student_prefs] for student_prefs in prefs]
+            owner, _ = matching.auction(capacity, [q * (n + 1) for q in quality], *preference_arrays(scaled))
+            self.assertFeasible(capacity, owner)
+            self.assertEqual(sum(row[j] for row, j in zip(values, owner)), self.best_total(capacity, values))
+
+    def test_auction_ties_end_with_every_student_placed(self):
+        # Identical values: epsilon is the only thing that raises prices
+        for epsilon in (1, 2, 7):
+            owner, stats = matching.auction([2, 2, 1], [3, 3, 3], *preference_arrays([[]] * 5), epsilon=epsilon)
+            self.assertFeasible([2, 2, 1], owner)
+            self.assertTrue(stats['converged'])
+
+    def test_auction_bands_break_ties_by_affinity(self):
+        capacity = [1, 1]
+        arrays = preference_arrays([[], []])
+        for band, expected in (([0, 1], [0, 1]), ([1, 0], [1, 0])):
+            owner, _ = matching.auction(capacity, [0, 0], *arrays, band=band, band_weight=[1, 0], affinity=[1, 0])
+            self.assertEqual(owner, expected)
+
+    def test_auction_out_of_time_places_greedily(self):
+        capacity = [900, 900, 900]
+        owner, stats = matching.auction(capacity, [2, 1, 0], *preference_arrays([[]] * 2500), time_budget=0)
+        self.assertFalse(stats['converged'])
+        self.assertFeasible(capacity, owner)
+
+    def test_deferred_acceptance_hand_checked(self):
+        # Students propose in rank order; student 0 takes lecturer 0 and
+        # student 1, who also wants it most, falls back to its second choice
+        capacity = [1, 1, 1]
+        quality = [5, 4, 3]
+        prefs = [[], [(0, 9), (2, 8)], [(2, 10)]]
+        owner, _ = matching.deferred_acceptance(capacity, quality, *preference_arrays(prefs))
+        self.assertEqual(owner, [0, 2, 1])
+
+    def test_deferred_acceptance_is_stable(self):
+        rng = random.Random(7)
+        for _ in range(60):
+            n, m = rng.randint(1, 8), rng.randint(1, 4)
+            capacity, quality, prefs = random_instance(rng, n, m)
+            owner, _ = matching.deferred_acceptance(capacity, quality, *preference_arrays(prefs))
+            self.assertFeasible(capacity, owner)
+            values = self.values(quality, prefs)
+            for i, row in enumerate(values):
+                for j in range(m):
+                    if capacity[j] and row[j] > row[owner[i]]:
+                        # Lecturer j must be full of students ranked ahead of i
+                        held = [k for k in range(n) if owner[k] == j]
+                        self.assertEqual(len(held), capacity[j], f"({i}, {j}) blocks")
+                        self.assertTrue(all(k < i for k in held), f"({i}, {j}) blocks")
+
+
+class RankingTests(TestCase):
+    def assertRanksMatchRecompute(self, *departments):
+        for department in departments:
+            expected = list(Student.objects.filter(department=department)
+                            .order_by('-gpa', 'matric_number').values_list('pk', flat=True))
+            ranks = dict(Student.objects.filter(department=department).values_list('pk', 'rank'))
+            self.assertEqual([ranks[pk] for pk in expected], list(range(1, len(expected) + 1)), department)
+            self.assertEqual(ranking.recompute_department(department), 0, department)
+
+    def test_insert(self):
+        for number, gpa in enumerate(['3.00', '3.50', '2.00', '3.50', '4.00', '3.00']):
+            make_student(number, gpa=gpa)
+            self.assertRanksMatchRecompute('Computer Science')
+
+    def test_move_within_a_department(self):
+        students = [make_student(number, gpa=gpa) for number, gpa in enumerate(['3.00', '3.50', '2.00', '4.00'])]
+        for student, gpa in [(students[2], '3.90'), (students[3], '1.00'), (students[0], '3.50'), (students[1], '3.50')]:
+            student.gpa = Decimal(gpa)
+            student.save()
+            self.assertRanksMatchRecompute('Computer Science')
+
+    def test_move_between_departments(self):
+        students = [make_student(number, department, gpa) for number, (department, gpa) in
+                    enumerate([('Computer Science', '3.00'), ('Computer Science', '3.50'),
+                               ('Mathematics', '3.20'), ('Mathematics', '2.50')])]
+        for student in (students[1], students[3]):
+            student.department = 'Mathematics' if student.department == 'Computer Science' else 'Computer Science'
+            student.save()
+            self.assertRanksMatchRecompute('Computer Science', 'Mathematics')
+
+    def test_remove(self):
+        students = [make_student(number, gpa=gpa) for number, gpa in enumerate(['3.00', '3.50', '2.00', '3.50'])]
+        students[1].delete()
+        self.assertRanksMatchRecompute('Computer Science')
+        # Several students of one department in a single cascade
+        User.objects.filter(student__in=students[2:]).delete()
+        self.assertRanksMatchRecompute('Computer Science')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RankingConcurrencyTests(TransactionTestCase):
+    def test_concurrent_inserts_get_distinct_ranks(self):
+        make_student(0, gpa='3.00')
+        count = ranking.position_for
+
+        def slow_count(*args, **kwargs):
+            # Hold the count long enough for the other insert to count as well
+            result = count(*args, **kwargs)
+            time.sleep(0.3)
+            return result
+
+        errors = []
+
+        def insert(number, gpa):
+            try:
+                make_student(number, gpa=gpa)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        with mock.patch.object(ranking, 'position_for', slow_count):
+            threads = [threading.Thread(target=insert, args=args) for args in ((1, '3.50'), (2, '3.20'))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(Student.objects.values_list('rank', flat=True)), [1, 2, 3])
+        self.assertEqual(ranking.recompute_department('Computer Science'), 0)
+
+
+class GpaImportTests(TestCase):
+    def setUp(self):
+        self.students = [make_student(number, department) for number, department in
+                         enumerate(['Computer Science', 'Computer Science', 'Computer Science', 'Mathematics'])]
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+
+    def import_csv(self, *rows):
+        path = f'{self.root}/gpas.csv'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('matric_number,gpa\n' + ''.join(f'{row}\n' for row in rows))
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            call_command('import_gpas', path, stdout=stdout, stderr=stderr)
+        finally:
+            self.stderr = stderr.getvalue()
+        return stdout.getvalue()
+
+    def ranks(self, department):
+        return list(Student.objects.filter(department=department).order_by('rank').values_list('matric_number', 'gpa'))
+
+    def test_imports_a_csv_and_re_ranks(self):
+        output = self.import_csv('M0000002,3.90', 'M0000001,3.50')
+        self.assertIn('2 updated, 0 unchanged; re-ranked 1 department(s)', output)
+        self.assertEqual(self.ranks('Computer Science'), [
+            ('M0000002', Decimal('3.90')), ('M0000001', Decimal('3.50')), ('M0000000', Decimal('3.00')),
+        ])
+        self.assertEqual(self.ranks('Mathematics'), [('M0000003', Decimal('3.00'))])
+        self.assertEqual(ranking.recompute_department('Computer Science'), 0)
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        with self.assertRaisesMessage(CommandError, '4 invalid row(s); nothing was imported.'):
+            self.import_csv('M0000001,3.90', 'M0000002,-1', 'M9999999,3.00', 'M0000001,2.00', 'M0000003')
+        self.assertEqual(self.stderr.splitlines(), [
+            "line 3: Invalid GPA '-1': GPA cannot be negative.",
+            'line 5: Duplicate matric number M0000001',
+            'line 6: Expected two columns: matric_number,gpa',
+            'line 4: Unknown matric number M9999999',
+        ])
+        self.assertEqual(set(Student.objects.values_list('gpa', flat=True)), {Decimal('3.00')})
+
+    def test_only_changed_rows_and_their_departments_are_written(self):
+        make_student(4, 'Physics')
+        rows = ['M0000000,3.00', 'M0000001,3.50', 'M0000003,3.00', 'M0000004,3']
+        with mock.patch('api.gpa_import.ranking.recompute_department',
+                        wraps=ranking.recompute_department) as recompute:
+            summary = gpa_import.import_gpas(gpa_import.parse_rows(rows, 'csv'))
+        self.assertEqual((summary['rows'], summary['updated'], summary['unchanged']), (4, 1, 3))
+        self.assertEqual(summary['departments'], ['Computer Science'])
+        recompute.assert_called_once_with('Computer Science')
+        self.assertEqual(self.ranks('Computer Science')[0], ('M0000001', Decimal('3.50')))
+
+        with mock.patch('api.gpa_import.ranking.recompute_department') as recompute:
+            summary = gpa_import.import_gpas(gpa_import.parse_rows(rows, 'csv'))
+        self.assertEqual((summary['updated'], summary['unchanged'], summary['departments']), (0, 4, []))
+        recompute.assert_not_called()
+
+
+class RatingUpsertTests(TestCase):
+    def setUp(self):
+        self.student = make_student(1)
+        self.lecturers = [make_lecturer(i) for i in range(3)]
+
+    def assertCounters(self, lecturer, rating_sum, rating_count):
+        lecturer.refresh_from_db()
+        self.assertEqual((lecturer.rating_sum, lecturer.rating_count), (rating_sum, rating_count))
+        self.assertEqual(lecturer.average_rating, ratings.average_for(rating_sum, rating_count))
+
+    def test_inserts_count_once(self):
+        first, second, _ = self.lecturers
+        ratings.upsert(self.student.pk, {first.pk: 4, second.pk: 2})
+        self.assertCounters(first, 4, 1)
+        self.assertCounters(second, 2, 1)
+        self.assertEqual(ratings.verify(), [])
+
+    def test_updates_adjust_by_the_difference(self):
+        first, second, third = self.lecturers
+        ratings.upsert(self.student.pk, {first.pk: 4, second.pk: 2})
+        ratings.upsert(self.student.pk, {first.pk: 1, second.pk: 2, third.pk: 5})
+        self.assertCounters(first, 1, 1)
+        self.assertCounters(second, 2, 1)
+        self.assertCounters(third, 5, 1)
+        self.assertEqual(LecturerRating.objects.count(), 3)
+        self.assertEqual(ratings.verify(), [])
+
+
+
+class RatingSaveTests(TestCase):
+    def setUp(self):
+        self.student = make_student(1)
+        self.first, self.second = make_lecturer(1), make_lecturer(2)
+
+    def assertCounters(self, lecturer, rating_sum, rating_count):
+        lecturer.refresh_from_db()
+        self.assertEqual((lecturer.rating_sum, lecturer.rating_count), (rating_sum, rating_count))
+        self.assertEqual(ratings.verify(), [])
+
+    def rate(self, lecturer, value):
+        return LecturerRating.objects.create(student=self.student, lecturer=lecturer, rating=value)
+
+    def test_create(self):
+        self.rate(self.first, 4)
+        self.assertCounters(self.first, 4, 1)
+
+    def test_update(self):
+        rating = self.rate(self.first, 4)
+        rating.rating = 2
+        rating.save()
+        self.assertCounters(self.first, 2, 1)
+
+    def test_move_to_another_lecturer(self):
+        rating = self.rate(self.first, 4)
+        rating.lecturer = self.second
+        rating.save()
+        self.assertCounters(self.first, 0, 0)
+        self.assertCounters(self.second, 4, 1)
+
+    def test_delete(self):
+        self.rate(self.first, 4)
+        self.rate(self.second, 3)
+        LecturerRating.objects.get(lecturer=self.first).delete()
+        self.assertCounters(self.first, 0, 0)
+        self.assertCounters(self.second, 3, 1)
+
+    def test_stale_copies_use_the_stored_values(self):
+        rating = self.rate(self.first, 3)
+        one, other = LecturerRating.objects.get(pk=rating.pk), LecturerRating.objects.get(pk=rating.pk)
+        one.rating = 5
+        one.save()
+        other.rating = 1
+        other.save()
+        self.assertCounters(self.first, 1, 1)
+
+        one.lecturer = self.second
+        one.save()
+        other.delete()
+        self.assertCounters(self.first, 0, 0)
+        self.assertCounters(self.second, 0, 0)
+        self.assertEqual(other.delete(), (0, {}))
+        self.assertCounters(self.second, 0, 0)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RatingUpsertConcurrencyTests(TransactionTestCase):
+    def test_concurrent_first_ratings_count_once(self):
+        student = make_student(1)
+        lecturer = make_lecturer(1)
+        read = ratings.existing_ratings
+
+        def slow_read(*args):
+            # Hold the read long enough for the other submission to read as well
+            result = read(*args)
+            time.sleep(0.3)
+            return result
+
+        errors = []
+
+        def submit(value):
+            try:
+                ratings.upsert(student.pk, {lecturer.pk: value})
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        with mock.patch.object(ratings, 'existing_ratings', slow_read):
+            threads = [threading.Thread(target=submit, args=(value,)) for value in (4, 2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        lecturer.refresh_from_db()
+        self.assertEqual(lecturer.rating_count, 1)
+        self.assertIn(lecturer.rating_sum, (4, 2))
+        self.assertEqual(ratings.verify(), [])
+
+
+class RunAssignmentsViewTests(APITestCase):
+    def setUp(self):
+        self.students = [make_student(i) for i in range(4)]
+        self.lecturers = [make_lecturer(i) for i in range(2)]
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def run_assignments(self, data, **kwargs):
+        return self.client.post(reverse('assign-students'), data, **kwargs)
+
+    def test_false_strings_are_false(self):
+        for value in ('false', 'False', '0', 'off'):
+            Assignment.objects.all().delete()
+            response = self.run_assignments({'dry_run': value, 'by_department': value})
+            self.assertEqual(response.status_code, 201, (value, response.data))
+            self.assertEqual(Assignment.objects.count(), len(self.students))
+
+    def test_dry_run_writes_nothing(self):
+        for data, kwargs in (({'dry_run': 'true'}, {}), ({'dry_run': True}, {'format': 'json'})):
+            response = self.run_assignments(data, **kwargs)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertFalse(Assignment.objects.exists())
+
+    def test_invalid_boolean_is_rejected(self):
+        response = self.run_assignments({'only_unassigned': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('only_unassigned', response.data)
+
+
+class IncrementalRunTests(TestCase):
+    def setUp(self):
+        self.students = [make_student(i) for i in range(9)]
+        self.lecturers = [make_lecturer(i) for i in range(3)]
+        first, second, _ = self.lecturers
+        # Loads of 3, 1 and 0; students 4 to 8 are unassigned
+        self.existing = {student.pk: first.pk for student in self.students[:3]}
+        self.existing[self.students[3].pk] = second.pk
+        Assignment.objects.bulk_create(
+            Assignment(student_id=student_id, lecturer_id=lecturer_id)
+            for student_id, lecturer_id in self.existing.items()
+        )
+
+    def loads(self):
+        return [Assignment.objects.filter(lecturer=lecturer).count() for lecturer in self.lecturers]
+
+    def assertExistingKept(self, summary):
+        self.assertEqual((summary['students'], summary['new'], summary['moved'], summary['removed']), (5, 5, 0, 0))
+        self.assertEqual(dict(Assignment.objects.filter(student_id__in=self.existing)
+                              .values_list('student_id', 'lecturer_id')), self.existing)
+
+    def test_round_robin_carries_on_from_the_loads(self):
+        summary = run_assignments(only_unassigned=True)
+        self.assertExistingKept(summary)
+        self.assertEqual(self.loads(), [3, 3, 3])
+
+    def test_capacities_count_the_current_load(self):
+        first, second, _ = self.lecturers
+        Lecturer.objects.filter(pk=first.pk).update(capacity=3)
+        Lecturer.objects.filter(pk=second.pk).update(capacity=2)
+        summary = run_assignments('optimal', only_unassigned=True)
+        self.assertExistingKept(summary)
+        self.assertEqual(summary['unassigned'], 0)
+        self.assertEqual(self.loads(), [3, 2, 4])
+
+    def test_a_second_run_has_nothing_to_place(self):
+        run_assignments(only_unassigned=True)
+        summary = run_assignments(only_unassigned=True)
+        self.assertEqual((summary['students'], summary['new']), (0, 0))
+        self.assertEqual(self.loads(), [3, 3, 3])
+
+
+class RunAssignmentsByDepartmentTests(TransactionTestCase):
+    def setUp(self):
+        self.students = [make_student(i, department) for i, department in
+                         enumerate(['Computer Science', 'Mathematics'] * 3)]
+        for i, department in enumerate(['Computer Science', 'Mathematics']):
+            response = self.client.post(reverse('register'), {
+                'email': f'lecturer{i}@example.com', 'full_name': f'Lecturer {i}', 'role': 'lecturer',
+                'password': 'Str0ng-passw0rd', 'password2': 'Str0ng-passw0rd', 'department': department,
+            })
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def assertPlacedInOwnDepartment(self, summary):
+        self.assertEqual(summary['assigned'], len(self.students))
+        for assignment in Assignment.objects.select_related('student', 'lecturer__user'):
+            self.assertEqual(assignment.student.department, assignment.lecturer.user.department)
+
+    @override_settings(ASSIGNMENT_WORKERS=2)
+    def test_partitions_are_solved_in_worker_processes(self):
+        summary = run_assignments('optimal', by_department=True)
+        self.assertEqual(summary['solver']['workers'], 2)
+        self.assertPlacedInOwnDepartment(summary)
+
+    @override_settings(ASSIGNMENT_WORKERS=2)
+    def test_no_workers_are_started_inside_a_transaction(self):
+        with transaction.atomic():
+            summary = run_assignments('optimal', by_department=True)
+        self.assertEqual(summary['solver']['workers'], 1)
+        self.assertPlacedInOwnDepartment(summary)
+
+
+class AssignmentReportTests(TestCase):
+    key = '0123456789abcdef0123456789abcdef'
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        report_root = override_settings(REPORT_ROOT=root.name)
+        report_root.enable()
+        self.addCleanup(report_root.disable)
+        self.url = reverse('admin:assignment-report', args=[self.key])
+
+    def message(self, response):
+        return ' '.join(str(message) for message in get_messages(response.wsgi_request))
+
+    def test_download_needs_a_staff_login(self):
+        reports.build_pdf([], reports.report_path(self.key))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response.url)
+
+        self.client.force_login(make_admin())
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_a_build_is_seen_through_its_marker(self):
+        self.client.force_login(make_admin())
+        self.assertTrue(reports._claim(self.key))
+        self.assertFalse(reports._claim(self.key))
+        self.assertTrue(reports.is_running(self.key))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('still being generated', self.message(response))
+
+    def test_unknown_keys_are_not_paths(self):
+        self.client.force_login(make_admin())
+        response = self.client.get(reverse('admin:assignment-report', args=['..']))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('no longer available', self.message(response))
+
+
+class RunAssignmentsAdminTests(TestCase):
+    def setUp(self):
+        self.students = [make_student(i) for i in range(4)]
+        self.lecturers = [make_lecturer(i) for i in range(2)]
+        self.client.force_login(make_admin())
+        self.url = reverse('admin:run-assignments')
+
+    def message(self, response):
+        return ' '.join(str(message) for message in get_messages(response.wsgi_request))
+
+    def test_a_get_only_previews(self):
+        response = self.client.get(self.url, {'strategy': 'optimal', 'dry_run': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'method="post"')
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+        self.assertContains(response, 'name="strategy" value="optimal"')
+        self.assertFalse(Assignment.objects.exists())
+
+    def test_a_get_does_not_apply(self):
+        for data in ({'dry_run': 'false'}, {}):
+            response = self.client.get(self.url, data)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('only be applied', self.message(response))
+        self.assertFalse(Assignment.objects.exists())
+
+    def test_a_post_applies(self):
+        response = self.client.post(self.url, {'strategy': 'optimal'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('executed successfully', self.message(response))
+        self.assertEqual(Assignment.objects.count(), len(self.students))
+
+    def test_the_post_needs_a_csrf_token(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(User.objects.get(role='admin'))
+        response = client.post(self.url, {'strategy': 'optimal'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Assignment.objects.exists())
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_admin()
+        for number in range(9):
+            make_student(number, ['Computer Science', 'Mathematics'][number % 2], f'3.{number}0')
+        # Unranked students, as rows written around the ranking engine leave them
+        Student.objects.filter(user__email__in=['student1@example.com', 'student4@example.com',
+                                                'student6@example.com']).update(rank=None)
+        for number, rating in enumerate([4, 4, 2, 5, 4]):
+            lecturer = make_lecturer(number)
+            lecturer.average_rating = rating
+            lecturer.save()
+
+    def setUp(self):
+        token = MyTokenObtainPairSerializer.get_token(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def walk(self, url, link):
+        """Every page from ``url`` on, following ``link``: a list of (ids, body)."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            pages.append(([row['id'] for row in body['results']], body))
+            url = body[link]
+        return pages
+
+    def assertWalksInOrder(self, name, expected):
+        for page_size in (1, 2, 4, 100):
+            forward = self.walk(f"{reverse(name)}?page_size={page_size}", 'next')
+            self.assertEqual([pk for ids, _ in forward for pk in ids], expected, page_size)
+            # And back again from the last page
+            backward = self.walk(forward[-1][1]['previous'], 'previous') if len(forward) > 1 else []
+            ids = [pk for page, _ in reversed(backward) for pk in page] + forward[-1][0]
+            self.assertEqual(ids, expected, page_size)
+
+    def test_student_list_with_unranked_students(self):
+        students = Student.objects.order_by(F('department'), F('rank').asc(nulls_last=True), 'id')
+        expected = list(students.values_list('id', flat=True))
+        self.assertEqual(len(expected), 9)
+        self.assertWalksInOrder('student-list', expected)
+
+    def test_lecturer_list(self):
+        expected = list(Lecturer.objects.order_by('-average_rating', 'id').values_list('id', flat=True))
+        self.assertWalksInOrder('lecturer-list', expected)
+
+    def test_async_student_list_with_unranked_students(self):
+        students = Student.objects.order_by(F('department'), F('rank').asc(nulls_last=True), 'id')
+        self.assertWalksInOrder('async-student-list', list(students.values_list('id', flat=True)))
+
+
+class UserImportViewTests(APITestCase):
+    header = 'email,full_name,role,password,matric_number,department\n'
+
+    def setUp(self):
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def post(self, rows):
+        body = self.header + ''.join(
+            f'new{i}@example.com,New {i},student,Correct-Horse-{i},N{i:07d},Physics\n' for i in range(rows)
+        )
+        return self.client.generic('POST', reverse('user-import'), body, content_type='text/csv')
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_rows_are_capped_per_request(self):
+        response = self.post(3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('import_users command', response.data['detail'])
+        self.assertFalse(User.objects.filter(email__startswith='new').exists())
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_import_within_the_cap(self):
+        response = self.post(2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created']['student'], 2)
+        self.assertEqual(sorted(Student.objects.filter(department='Physics').values_list('rank', flat=True)), [1, 2])
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2, USER_IMPORT_WORKERS=2)
+    def test_requests_hash_without_a_process_pool(self):
+        with mock.patch('api.user_import.process_pool') as process_pool:
+            response = self.post(2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['hash_workers'], 1)
+        process_pool.assert_not_called()
+
+
+class LecturerCacheTests(APITestCase):
+    def setUp(self):
+        api_cache.cache.clear()
+        self.student = make_student(1)
+        self.lecturers = [make_lecturer(0), make_lecturer(1)]
+        token = MyTokenObtainPairSerializer.get_token(self.student.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def detail(self, lecturer):
+        response = self.client.get(reverse('lecturer-detail', args=[lecturer.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def rate(self, lecturer, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            LecturerRating.objects.create(student=self.student, lecturer=lecturer, rating=value)
+
+    def assertStats(self, kind, hits, misses):
+        self.assertEqual(api_cache.stats()[kind], {'hits': hits, 'misses': misses})
+
+    def test_detail_is_served_from_the_cache(self):
+        first, _ = self.lecturers
+        self.detail(first)
+        with self.assertNumQueries(1):  # the version read
+            self.detail(first)
+        self.assertStats(api_cache.LECTURER_DETAIL, hits=1, misses=1)
+
+    def test_rating_a_lecturer_invalidates_its_detail(self):
+        first, _ = self.lecturers
+        self.detail(first)
+        self.rate(first, 5)
+        self.assertEqual(self.detail(first).data['average_rating'], '5.00')
+        self.assertStats(api_cache.LECTURER_DETAIL, hits=0, misses=2)
+
+    def test_rating_a_lecturer_keeps_the_others_cached(self):
+        first, second = self.lecturers
+        self.detail(second)
+        self.rate(first, 5)
+        self.detail(second)
+        self.assertStats(api_cache.LECTURER_DETAIL, hits=1, misses=1)
+
+    def test_rating_a_lecturer_invalidates_the_list(self):
+        first, _ = self.lecturers
+        self.client.get(reverse('lecturer-list'))
+        self.rate(first, 5)
+        self.client.get(reverse('lecturer-list'))
+        self.assertStats(api_cache.LECTURER_LIST, hits=0, misses=2)
+
+    def test_renaming_a_lecturer_invalidates_its_detail(self):
+        first, _ = self.lecturers
+        self.detail(first)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.user.full_name = 'Renamed'
+            first.user.save()
+        self.detail(first)
+        self.assertStats(api_cache.LECTURER_DETAIL, hits=0, misses=2)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.students = [make_student(i) for i in range(2)]
+        self.lecturers = [make_lecturer(0)]
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def etag(self):
+        response = self.client.get(reverse('assignments'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        return response['ETag']
+
+    def test_a_current_etag_gets_304_with_no_body(self):
+        etag = self.etag()
+        with self.assertNumQueries(1):  # the version read, nothing else
+            response = self.client.get(reverse('assignments'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(reverse('assignments'), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_the_etag_depends_on_the_query(self):
+        self.assertNotEqual(self.etag(), self.client.get(reverse('assignments'), {'view': 'flat'})['ETag'])
+
+    def test_a_rating_changes_the_etag_once_committed(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks() as callbacks:
+            LecturerRating.objects.create(student=self.students[0], lecturer=self.lecturers[0], rating=4)
+        self.assertEqual(self.etag(), etag)  # bumped on commit, not before
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_a_gpa_import_changes_the_etag(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            gpa_import.import_gpas(gpa_import.parse_rows(['M0000000,3.90\n'], 'csv'))
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_an_assignment_run_changes_the_etag(self):
+        etag = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            run_assignments()
+        changed = self.etag()
+        self.assertNotEqual(changed, etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_assignments()  # the same assignments again: nothing written
+        self.assertEqual(self.etag(), changed)
+
+
+class FlatAssignmentTests(APITestCase):
+    def setUp(self):
+        students = [make_student(1, 'Computer Science', '3.75'), make_student(2, 'Mathematics', '2.10'),
+                    make_student(3, 'Computer Science', '3.20')]
+        lecturers = [make_lecturer(1), make_lecturer(2)]
+        LecturerRating.objects.create(student=students[0], lecturer=lecturers[0], rating=5)
+        LecturerRating.objects.create(student=students[1], lecturer=lecturers[0], rating=2)
+        for i, student in enumerate(students):
+            Assignment.objects.create(student=student, lecturer=lecturers[i % 2])
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def assignments(self, **params):
+        response = self.client.get(reverse('assignments'), params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return json.loads(response.content)['results']
+
+    def test_flat_rows_match_the_nested_serializer(self):
+        nested, flat = self.assignments(), self.assignments(view='flat')
+        self.assertEqual(len(flat), 3)
+        # Each flat key is read through the same lookup as the nested field it copies
+        lookups = {'id': 'id', 'assigned_date': 'assigned_date',
+                   'student_id': 'student__id', 'lecturer_id': 'lecturer__id',
+                   **{key: expression.name for key, expression in FLAT_ASSIGNMENT_FIELDS.items()}}
+        for nested_row, flat_row in zip(nested, flat):
+            self.assertEqual(set(flat_row), set(lookups))
+            for key, lookup in lookups.items():
+                value = nested_row
+                for part in lookup.split('__'):
+                    value = value[part]
+                self.assertEqual(flat_row[key], value, key)
+
+
+@mock.patch('api.exports.ROWS_PER_WRITE', 2)
+class AssignmentExportTests(APITestCase):
+    def setUp(self):
+        students = [make_student(i) for i in range(3)]
+        User.objects.filter(pk=students[1].user_id).update(full_name='O\'Neil, "Jr" & <Co>\x01')
+        lecturers = [make_lecturer(0), make_lecturer(1)]
+        for i, student in enumerate(students):
+            Assignment.objects.create(student=student, lecturer=lecturers[i % 2])
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def export(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def assignments(self):
+        return Assignment.objects.select_related('student__user', 'lecturer__user').order_by('id')
+
+    def spreadsheet_rows(self):
+        return [exports.XLSX_HEADER] + [
+            [a.student.user.full_name.replace('\x01', ''), a.student.matric_number, a.lecturer.user.full_name,
+             a.assigned_date.strftime('%Y-%m-%d')]
+            for a in self.assignments()
+        ]
+
+    def test_csv_has_a_header_and_a_row_per_assignment(self):
+        response, content = self.export('assignments-export-csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="assignments.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows, [exports.EXPORT_HEADER] + [
+            [f'{a.student.matric_number} - {a.student.user.full_name}', a.lecturer.user.full_name,
+             a.assigned_date.strftime(exports.DATE_FORMAT)]
+            for a in self.assignments()
+        ])
+
+    def test_xlsx_sheet_has_a_header_and_a_row_per_assignment(self):
+        response, content = self.export('assignments-export-xlsx')
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = [[cell.text for cell in row.iterfind('s:c/s:is/s:t', namespace)]
+                for row in sheet.iterfind('s:sheetData/s:row', namespace)]
+        self.assertEqual(rows, self.spreadsheet_rows())
+
+    @skipIf(openpyxl is None, "openpyxl is not installed")
+    def test_xlsx_opens_as_a_workbook(self):
+        _, content = self.export('assignments-export-xlsx')
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Assignments'])
+        rows = [list(row) for row in workbook['Assignments'].iter_rows(values_only=True)]
+        self.assertEqual(rows, self.spreadsheet_rows())
+
+
+class HasRatedTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [make_student(i) for i in range(6)]
+        cls.lecturers = [make_lecturer(0), make_lecturer(1)]
+        first, second = cls.lecturers
+        for student in cls.students[0::2]:
+            LecturerRating.objects.create(student=student, lecturer=first, rating=4)
+        LecturerRating.objects.create(student=cls.students[1], lecturer=second, rating=2)
+        for student in cls.students[:4]:
+            Assignment.objects.create(student=student, lecturer=first)
+        versions.current(versions.RESOURCES)
+
+    def setUp(self):
+        super().setUp()
+        token = MyTokenObtainPairSerializer.get_token(make_admin()).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def has_rated(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), {'page_size': 50, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertQueryBudget(response)
+        students = response.data['results' if 'results' in response.data else 'students']
+        return {student['matric_number']: student['has_rated'] for student in students}
+
+    def test_student_list_for_a_lecturer(self):
+        first, second = self.lecturers
+        self.assertEqual(self.has_rated('student-list', lecturer_id=first.pk), {
+            'M0000000': True, 'M0000001': False, 'M0000002': True,
+            'M0000003': False, 'M0000004': True, 'M0000005': False,
+        })
+        rated = self.has_rated('student-list', lecturer_id=second.pk)
+        self.assertEqual([number for number, value in rated.items() if value], ['M0000001'])
+        self.assertFalse(any(self.has_rated('student-list').values()))
+
+    def test_students_assigned_to_a_lecturer(self):
+        first, second = self.lecturers
+        self.assertEqual(self.has_rated('students-assigned-to-lecturer', first.pk), {
+            'M0000000': True, 'M0000001': False, 'M0000002': True, 'M0000003': False,
+        })
+        self.assertEqual(self.has_rated('students-assigned-to-lecturer', second.pk), {})
+
+
+class AsyncParityTests(APITestCase):
+    """Each async view answers with the same status and JSON as its sync counterpart."""
+    pairs = [
+        ('student-list', 'async-student-list'),
+        ('lecturer-list', 'async-lecturer-list'),
+        ('supervisor-assigned-to-student', 'async-supervisor-assigned-to-student'),
+        ('students-assigned-to-lecturer', 'async-students-assigned-to-lecturer'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [make_student(i, department, gpa) for i, (department, gpa) in enumerate(
+            [('Computer Science', '3.50'), ('Computer Science', '3.00'), ('Mathematics', '3.80'),
+             ('Mathematics', '2.90'), ('Physics', '3.10')])]
+        cls.lecturers = [make_lecturer(0), make_lecturer(1), make_lecturer(2)]
+        for student in cls.students[:3]:
+            LecturerRating.objects.create(student=student, lecturer=cls.lecturers[0], rating=4)
+        LecturerRating.objects.create(student=cls.students[3], lecturer=cls.lecturers[1], rating=5)
+        for i, student in enumerate(cls.students[:4]):
+            Assignment.objects.create(student=student, lecturer=cls.lecturers[i % 2])
+
+    def setUp(self):
+        api_cache.cache.clear()
+
+    def login(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        # Links point back at each view's own URL
+        return response.status_code, json.loads(response.content.decode().replace('/async/', '/'))
+
+    def assertSameResponses(self, name, async_name, *args, **params):
+        query = f"?{'&'.join(f'{key}={value}' for key, value in params.items())}" if params else ''
+        sync = self.fetch(reverse(name, args=args) + query)
+        asynchronous = self.fetch(reverse(async_name, args=args) + query)
+        self.assertEqual(asynchronous, sync, (name, args, params))
+        return sync
+
+    def assertSamePages(self, name, async_name, *args, **params):
+        # Follow the next links of both views through the whole list
+        status, data = self.assertSameResponses(name, async_name, *args, **params)
+        self.assertEqual(status, 200)
+        pages = 1
+        while data.get('next'):
+            url = data['next']
+            status, data = self.fetch(url)
+            self.assertEqual(self.fetch(url.replace('/api/v1/', '/api/v1/async/')), (status, data), url)
+            pages += 1
+        return pages
+
+    def test_lists_page_alike(self):
+        self.login(make_admin())
+        first, second, third = self.lecturers
+        self.assertEqual(self.assertSamePages('student-list', 'async-student-list', page_size=2), 3)
+        self.assertSamePages('student-list', 'async-student-list', page_size=2, lecturer_id=first.pk)
+        self.assertSamePages('lecturer-list', 'async-lecturer-list', page_size=2)
+        for lecturer in (first, second, third):
+            self.assertSamePages('students-assigned-to-lecturer', 'async-students-assigned-to-lecturer',
+                                 lecturer.pk, page_size=1)
+
+    def test_supervisor_found_and_missing(self):
+        self.login(self.students[0].user)
+        for student, expected in ((self.students[0], 200), (self.students[4], 404)):
+            status, _ = self.assertSameResponses(
+                'supervisor-assigned-to-student', 'async-supervisor-assigned-to-student', student.pk)
+            self.assertEqual(status, expected)
+
+    def test_invalid_queries_are_rejected_alike(self):
+        self.login(make_admin())
+        status, _ = self.assertSameResponses('student-list', 'async-student-list', cursor='not-a-cursor')
+        self.assertEqual(status, 404)
+
+    def test_authentication_failures_match(self):
+        lecturer = self.lecturers[0]
+        args = {'supervisor-assigned-to-student': [self.students[0].pk],
+                'students-assigned-to-lecturer': [lecturer.pk]}
+        for credentials in ({}, {'HTTP_AUTHORIZATION': 'Bearer not-a-token'}, {'HTTP_AUTHORIZATION': 'Basic xyz'}):
+            self.client.credentials(**credentials)
+            for name, async_name in self.pairs:
+                status, _ = self.assertSameResponses(name, async_name, *args.get(name, []))
+                self.assertEqual(status, 401, (name, credentials))
+
+    def test_users_loaded_from_the_database_alike(self):
+        # Tokens without the profile claims make both views load the user
+        user = self.students[0].user
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        for expected in (200, 401):
+            for name, async_name in self.pairs[:2]:
+                status, _ = self.assertSameResponses(name, async_name)
+                self.assertEqual(status, expected, name)
+            User.objects.filter(pk=user.pk).update(is_active=False)
+
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Every endpoint in QUERY_BUDGETS stays within its budget; one test per URL name."""
+    page = {'page_size': 2}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_admin()
+        cls.students = [
+            make_student(1, 'Computer Science', '3.50'),
+            make_student(2, 'Computer Science', '3.00'),
+            make_student(3, 'Mathematics', '3.80'),
+            make_student(4, 'Mathematics', '2.90'),
+        ]
+        cls.lecturers = [make_lecturer(1), make_lecturer(2)]
+        for student in cls.students[:3]:
+            LecturerRating.objects.create(student=student, lecturer=cls.lecturers[0], rating=4)
+        for i, student in enumerate(cls.students):
+            Assignment.objects.create(student=student, lecturer=cls.lecturers[i % 2])
+        # Start the version counters, as any earlier request would have
+        versions.current([*versions.RESOURCES, *(versions.lecturer(lecturer.pk) for lecturer in cls.lecturers)])
+
+    def login(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get(self, user, name, *args, **params):
+        self.login(user)
+        response = self.client.get(reverse(name, args=args), params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def assertGetWithinBudget(self, user, name, *args, **params):
+        # Twice, so responses served from the cache are measured as well
+        for _ in range(2):
+            self.assertQueryBudget(self.get(user, name, *args, **params))
+
+    def test_every_budget_has_a_test(self):
+        for name in QUERY_BUDGETS:
+            self.assertTrue(hasattr(self, f"test_{name.replace('-', '_')}"), f"No test for {name!r}")
+
+    def test_user_detail(self):
+        self.assertGetWithinBudget(self.students[0].user, 'user-detail')
+
+    def test_student_list(self):
+        self.assertGetWithinBudget(self.admin, 'student-list', **self.page)
+        self.assertGetWithinBudget(self.admin, 'student-list', lecturer_id=self.lecturers[0].pk, **self.page)
+
+    def test_student_detail(self):
+        self.assertGetWithinBudget(self.admin, 'student-detail', self.students[0].pk)
+
+    def test_supervisor_assigned_to_student(self):
+        student = self.students[0]
+        self.assertGetWithinBudget(student.user, 'supervisor-assigned-to-student', student.pk)
+
+    def test_lecturer_list(self):
+        self.assertGetWithinBudget(self.students[0].user, 'lecturer-list', **self.page)
+
+    def test_lecturer_detail(self):
+        self.assertGetWithinBudget(self.students[0].user, 'lecturer-detail', self.lecturers[0].pk)
+
+    def test_lecturer_ratings(self):
+        lecturer = self.lecturers[0]
+        self.assertGetWithinBudget(lecturer.user, 'lecturer-ratings', lecturer.pk, **self.page)
+
+    def test_students_assigned_to_lecturer(self):
+        lecturer = self.lecturers[0]
+        self.assertGetWithinBudget(lecturer.user, 'students-assigned-to-lecturer', lecturer.pk, **self.page)
+
+    def test_assignments(self):
+        self.assertGetWithinBudget(self.admin, 'assignments', **self.page)
+
+    def test_assignments_export_csv(self):
+        self.assertGetWithinBudget(self.admin, 'assignments-export-csv')
+
+    def test_assignments_export_xlsx(self):
+        self.assertGetWithinBudget(self.admin, 'assignments-export-xlsx')
+
+    def test_streamed_queries_are_counted(self):
+        for name in ('assignments-export-csv', 'assignments-export-xlsx'):
+            with self.assertLogs('api.sql', 'INFO') as logs:
+                response = self.get(self.admin, name)
+            self.assertEqual(query_count(response), 1, name)
+            # Logged once the body is done, with the export's query
+            self.assertEqual(json.loads(logs.records[-1].getMessage())['queries'], 1)
+            with self.assertRaises(AssertionError):
+                self.assertQueryBudget(response, budget=0)
+
+    def test_cache_stats(self):
+        self.assertGetWithinBudget(self.admin, 'cache-stats')
+
+    def test_async_student_list(self):
+        self.assertGetWithinBudget(self.admin, 'async-student-list', **self.page)
+
+    def test_async_supervisor_assigned_to_student(self):
+        student = self.students[0]
+        self.assertGetWithinBudget(student.user, 'async-supervisor-assigned-to-student', student.pk)
+
+    def test_async_lecturer_list(self):
+        self.assertGetWithinBudget(self.students[0].user, 'async-lecturer-list', **self.page)
+
+    def test_async_students_assigned_to_lecturer(self):
+        lecturer = self.lecturers[0]
+        self.assertGetWithinBudget(lecturer.user, 'async-students-assigned-to-lecturer', lecturer.pk, **self.page)
+
+    def test_rating_create(self):
+        student = self.students[3]
+        self.login(student.user)
+        response = self.client.post(reverse('rating-create'),
+                                    {'student': student.pk, 'lecturer': self.lecturers[0].pk, 'rating': 5})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertQueryBudget(response)
+
+    def test_rating_bulk_create(self):
+        student = self.students[3]
+        self.login(student.user)
+        payload = {'ratings': [{'lecturer': lecturer.pk, 'rating': 3} for lecturer in self.lecturers]}
+        response = self.client.post(reverse('rating-bulk-create'), payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertQueryBudget(response)
@@ -1,18 +1,28 @@
 from django.urls import path
 
+from .async_views import (
+    AsyncStudentListView, AsyncLecturerListView,
+    AsyncSupervisorAssignedToStudentView, AsyncStudentsAssignedToLecturerView,
+)
+
 from .views import (
     StudentListView, StudentDetailView,
-    LecturerListView, LecturerDetailView,
+    LecturerListView, LecturerDetailView, LecturerRatingsView,
     LecturerRatingCreateView, RoundRobinApiView, AssignmentListview,
     StudentsAssignedToLecturerView, SupervisorAssignedToStudentView,
-    BulkLecturerRatingCreateView,
+    BulkLecturerRatingCreateView, GpaImportView, CacheStatsView,
+    AssignmentCsvExportView, ExportAssignmentsView, UserImportView,
 )
 
 
 urlpatterns = [
+    # User Endpoints
+    path('users/import/', UserImportView.as_view(), name='user-import'),
+
     # Student Endpoints
     path('students/', StudentListView.as_view(), name='student-list'),
     path('students/<int:pk>/', StudentDetailView.as_view(), name='student-detail'),
+    path('students/gpa_import/', GpaImportView.as_view(), name='student-gpa-import'),
     path('student/<int:student_id>/supervisor/', SupervisorAssignedToStudentView.as_view(), name='supervisor-assigned-to-student'),
 
     
@@ -20,6 +30,7 @@ urlpatterns = [
     # Lecturer Endpoints
     path('lecturers/', LecturerListView.as_view(), name='lecturer-list'),
     path('lecturers/<int:pk>/', LecturerDetailView.as_view(), name='lecturer-detail'),
+    path('lecturers/<int:lecturer_id>/ratings/', LecturerRatingsView.as_view(), name='lecturer-ratings'),
     path('lecturer/<int:lecturer_id>/students/', StudentsAssignedToLecturerView.as_view(), name='students-assigned-to-lecturer'),
 
     # Lecturer Ratings
@@ -28,5 +39,16 @@ urlpatterns = [
 
     # Assignments
     path('assign_students/', RoundRobinApiView.as_view(), name='assign-students'),
-    path('assignments/', AssignmentListview.as_view(), name='assignments')
+    path('assignments/', AssignmentListview.as_view(), name='assignments'),
+    path('assignments/export/csv/', AssignmentCsvExportView.as_view(), name='assignments-export-csv'),
+    path('assignments/export/xlsx/', ExportAssignmentsView.as_view(), name='assignments-export-xlsx'),
+
+    # Async read endpoints, for the ASGI deployment
+    path('async/students/', AsyncStudentListView.as_view(), name='async-student-list'),
+    path('async/student/<int:student_id>/supervisor/', AsyncSupervisorAssignedToStudentView.as_view(), name='async-supervisor-assigned-to-student'),
+    path('async/lecturers/', AsyncLecturerListView.as_view(), name='async-lecturer-list'),
+    path('async/lecturer/<int:lecturer_id>/students/', AsyncStudentsAssignedToLecturerView.as_view(), name='async-students-assigned-to-lecturer'),
+
+    # Monitoring
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""
+Bulk import of users, such as a new intake of students.
+
+Rows of ``email,full_name,role,password,matric_number,department`` are read
+from CSV (with a header row) or NDJSON as a stream and validated in chunks
+the way registration validates a single user. Creating users one at a time
+is slow twice over: every password is hashed inline, and the profile
+created by the ``post_save`` signal re-ranks the student's department. So
+the import_users command hashes passwords across a pool of worker
+processes, users and their student or lecturer profiles are written with
+``bulk_create`` (which sends no signals), and ranks are recomputed exactly once per department touched.
+"""
+import csv
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from userauths.models import User
+
+from . import ranking, versions
+from .bulk import DEFAULT_CHUNK_SIZE, FORMATS, MAX_REPORTED_ERRORS, chunks
+from .models import Lecturer, Student
+from .workers import process_pool, worker_count
+
+FIELDS = ('email', 'full_name', 'role', 'password', 'matric_number', 'department')
+
+ROLES = [role for role, _ in User.ROLE_CHOICES]
+
+
+class UserImportError(Exception):
+    """Raised when any row of an import is invalid, or there are too many; nothing is written."""
+
+    def __init__(self, errors, error_count, message=None):
+        super().__init__(message or f"{error_count} invalid row(s)")
+        self.errors = errors
+        self.error_count = error_count
+
+
+def _record(values):
+    return {field: str(values.get(field) or '').strip() for field in FIELDS}
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    missing = [field for field in ('email', 'full_name', 'role') if field not in (reader.fieldnames or ())]
+    if missing:
+        yield 1, None, f"Header row must name the columns {', '.join(FIELDS)}; missing {', '.join(missing)}"
+        return
+    for row in reader:
+        if not any((value or '').strip() for value in row.values() if isinstance(value, str)):
+            continue
+        yield reader.line_num, _record(row), None
+
+
+def _ndjson_rows(lines):
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            values = json.loads(line)
+            if not isinstance(values, dict):
+                raise TypeError
+            yield line_no, _record(values), None
+        except (ValueError, TypeError):
+            yield line_no, None, "Expected a JSON object"
+
+
+def parse_rows(lines, fmt):
+    """
+    Yield ``(line_no, record, error)`` for each user in ``lines``, where
+    ``record`` maps each of ``FIELDS`` to a string ('' when absent).
+    """
+    if fmt == 'csv':
+        return _csv_rows(lines)
+    if fmt == 'ndjson':
+        return _ndjson_rows(lines)
+    raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _row_errors(record):
+    """Check one record on its own, as RegistrationSerializer does; return a list of messages."""
+    errors = []
+    try:
+        validate_email(record['email'])
+    except ValidationError:
+        errors.append(f"Invalid email {record['email']!r}")
+    if not record['full_name']:
+        errors.append("full_name is required")
+    elif len(record['full_name']) > User._meta.get_field('full_name').max_length:
+        errors.append("full_name is too long")
+    if record['role'] not in ROLES:
+        errors.append(f"role must be one of {', '.join(ROLES)}")
+    if record['role'] == 'student':
+        if not record['matric_number']:
+            errors.append("Matriculation number is required for students")
+        elif len(record['matric_number']) > Student._meta.get_field('matric_number').max_length:
+            errors.append("Matriculation number is too long")
+        if not record['department']:
+            errors.append("Department is required for students")
+    elif record['matric_number']:
+        errors.append("Matriculation number is only allowed for students")
+    if not record['password']:
+        errors.append("password is required")
+    else:
+        try:
+            user = User(email=record['email'], full_name=record['full_name'])
+            validate_password(record['password'], user=user)
+        except ValidationError as e:
+            errors.extend(e.messages)
+    return errors
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hash ``passwords`` with the default hasher, in this process by default or
+    spread over ``workers`` processes (0 meaning one per CPU). Returns the
+    hashes in order and the number of workers used.
+
+    Only the import_users command starts a pool; a web request hashes its
+    (capped) rows itself rather than forking a worker process per request.
+    """
+    workers = worker_count(workers, len(passwords))
+    if workers == 1:
+        return [make_password(password) for password in passwords], 1
+    with process_pool(workers) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(make_password, passwords, chunksize=chunksize)), workers
+
+
+def import_users(rows, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, max_rows=None):
+    """
+    Create the users in parsed ``rows`` with their profiles and return a
+    summary of what was created.
+
+    The import is all-or-nothing: if any row is invalid or repeats an email
+    or matric number, here or in the database, :class:`UserImportError` is
+    raised and nothing is written. Passwords are only hashed once every row
+    has passed, by ``workers`` processes (see :func:`hash_passwords`). With
+    ``max_rows``, an import of more rows than that is refused as soon as the
+    first row over the limit is read.
+    """
+    row_count = 0
+    errors = []
+    error_count = 0
+    emails = set()
+    matric_numbers = set()
+    records = []
+
+    def fail(line_no, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_no, 'error': message})
+
+    for chunk in chunks(rows, chunk_size):
+        valid = []
+        for line_no, record, error in chunk:
+            row_count += 1
+            if max_rows is not None and row_count > max_rows:
+                message = f"More than {max_rows} rows; import larger files with the import_users command"
+                raise UserImportError([{'line': line_no, 'error': message}], 1, message)
+            if error:
+                fail(line_no, error)
+                continue
+            record['email'] = User.objects.normalize_email(record['email'])
+            messages = _row_errors(record)
+            if record['email'] in emails:
+                messages.append(f"Duplicate email {record['email']}")
+            if record['matric_number'] and record['matric_number'] in matric_numbers:
+                messages.append(f"Duplicate matric number {record['matric_number']}")
+            emails.add(record['email'])
+            if record['matric_number']:
+                matric_numbers.add(record['matric_number'])
+            if messages:
+                fail(line_no, '; '.join(messages))
+            else:
+                valid.append((line_no, record))
+
+        taken_emails = set(User.objects.filter(
+            email__in=[record['email'] for _, record in valid]
+        ).values_list('email', flat=True))
+        taken_matrics = set(Student.objects.filter(
+            matric_number__in=[record['matric_number'] for _, record in valid if record['matric_number']]
+        ).values_list('matric_number', flat=True))
+        for line_no, record in valid:
+            if record['email'] in taken_emails:
+                fail(line_no, f"A user with email {record['email']} already exists")
+            elif record['matric_number'] in taken_matrics:
+                fail(line_no, f"A student with matric number {record['matric_number']} already exists")
+            else:
+                records.append(record)
+
+    if error_count:
+        raise UserImportError(errors, error_count)
+
+    hashes, workers = hash_passwords([record.pop('password') for record in records], workers)
+
+    created = {role: 0 for role in ROLES}
+    departments = set()
+    with transaction.atomic():
+        for start in range(0, len(records), chunk_size):
+            batch = records[start:start + chunk_size]
+            users = User.objects.bulk_create([
+                User(
+                    email=record['email'], full_name=record['full_name'], role=record['role'],
+                    matric_number=record['matric_number'] or None, department=record['department'] or None,
+                    password=password,
+                )
+                for record, password in zip(batch, hashes[start:start + chunk_size])
+            ])
+            if any(user.pk is None for user in users):
+                # Databases that cannot return ids from a bulk insert
+                ids = dict(User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'pk'))
+                for user in users:
+                    user.pk = ids[user.email]
+
+            Student.objects.bulk_create([
+                Student(user=user, matric_number=record['matric_number'], department=record['department'])
+                for user, record in zip(users, batch) if record['role'] == 'student'
+            ])
+            Lecturer.objects.bulk_create([
+                Lecturer(user=user) for user, record in zip(users, batch) if record['role'] == 'lecturer'
+            ])
+            for record in batch:
+                created[record['role']] += 1
+                if record['role'] == 'student':
+                    departments.add(record['department'])
+
+        rank_rows = sum(ranking.recompute_department(department) for department in sorted(departments))
+        if created['student']:
+            versions.bump(versions.STUDENTS)
+        if created['lecturer']:
+            versions.bump(versions.LECTURERS)
+
+    return {
+        'rows': len(records),
+        'created': created,
+        'departments': sorted(departments),
+        'rank_rows_touched': rank_rows,
+        'hash_workers': workers,
+    }
@@ -0,0 +1,93 @@
+"""
+Version counters for API resources, used for conditional GETs.
+
+Each resource (``students``, ``lecturers``, ``assignments``, ``ratings``)
+has a counter in the database (``ResourceVersion``) that is bumped, once
+the transaction commits, whenever anything that appears in its responses
+changes; see the receivers in :mod:`api.signals` and the bulk paths that
+bypass them. A response's ETag is derived from the counters of the
+resources it shows, so a client polling an unchanged resource can be
+answered ``304 Not Modified`` after one small query.
+
+Each lecturer also has a counter of its own (:func:`lecturer`), bumped
+along with ``lecturers`` whenever that lecturer's row, user or rating
+aggregates change, so a lecturer's detail is not invalidated by a rating
+of some other lecturer.
+
+The counters live in the database rather than the cache so that every
+worker process, and every management command writing to the same
+database, sees the same values. A counter that is missing (a flushed
+table) starts again from the current time in microseconds rather than
+from 1, so it never comes back to a value an old ETag was built from.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F
+
+STUDENTS = 'students'
+LECTURERS = 'lecturers'
+ASSIGNMENTS = 'assignments'
+RATINGS = 'ratings'
+RESOURCES = (STUDENTS, LECTURERS, ASSIGNMENTS, RATINGS)
+
+
+def lecturer(pk):
+    """The resource of one lecturer's own responses, such as its detail."""
+    return f'{LECTURERS}:{pk}'
+
+
+def _version_model():
+    from .models import ResourceVersion
+    return ResourceVersion
+
+
+def _epoch():
+    return time.time_ns() // 1000
+
+
+def _start(resources):
+    ResourceVersion = _version_model()
+    ResourceVersion.objects.bulk_create(
+        [ResourceVersion(resource=resource, version=_epoch()) for resource in resources],
+        ignore_conflicts=True,
+    )
+
+
+def _bump_now(resources):
+    ResourceVersion = _version_model()
+    updated = ResourceVersion.objects.filter(resource__in=resources).update(version=F('version') + 1)
+    if updated < len(resources):
+        _start(resources)
+
+
+def bump(*resources):
+    """Mark ``resources`` as changed when the current transaction commits."""
+    resources = set(resources)
+    transaction.on_commit(lambda: _bump_now(resources))
+
+
+def current(resources):
+    """
+    Return ``{resource: version}`` for ``resources``, in one query.
+    Counters that are missing are started here.
+    """
+    ResourceVersion = _version_model()
+    rows = ResourceVersion.objects.filter(resource__in=resources).values_list('resource', 'version')
+    versions = dict(rows)
+    if len(versions) < len(set(resources)):
+        _start(resource for resource in resources if resource not in versions)
+        versions = dict(rows.all())
+    return {resource: versions[resource] for resource in resources}
+
+
+async def acurrent(resources):
+    """current() for async views."""
+    ResourceVersion = _version_model()
+    rows = ResourceVersion.objects.filter(resource__in=resources).values_list('resource', 'version')
+    versions = {resource: version async for resource, version in rows}
+    if all(resource in versions for resource in resources):
+        return {resource: versions[resource] for resource in resources}
+    # Rare: some counter has not been started yet
+    return await sync_to_async(current)(resources)
@@ -1,44 +1,170 @@
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny, IsAuthenticated, IsAdminUser
-from django.http import HttpResponse
-# import pandas as pd
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+import codecs
+import hashlib
 
-from django.db.models import Avg
+from django.db.models import Avg, Exists, OuterRef
 from .models import Student, Lecturer, LecturerRating, Assignment
 from .serializers import (
     BulkLecturerRatingCreateSerializer, StudentSerializer, LecturerSerializer, LecturerRatingSerializer, 
-    AssignmentSerializer
+    AssignmentSerializer, RunAssignmentsSerializer, flat_assignment_data, flat_assignment_rows
 )
-from .permissions import IsAdminOrLecturer, IsAdminOrStudent, IsStudent, IsLecturer
+from .permissions import IsAdminOrLecturer, IsAdminOrStudent, IsStudent, IsLecturer, student_pk
+from .assignment import AssignmentError, run_assignments
+from .bulk import format_for_content_type
+from .gpa_import import GpaImportError, import_gpas, parse_rows
+from . import user_import
+from .pagination import KeysetPagination
+from .exports import streaming_csv_response, streaming_xlsx_response
+from . import cache as api_cache
+from . import versions
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GETs for read views. Every response carries a strong ETag
+    derived from the version counters of the resources it shows (see
+    api.versions), and a client sending back a current ETag
+    (If-None-Match) gets 304 Not Modified after the one query reading the
+    counters, before any other query or serialization runs.
+
+    No Last-Modified date is sent: HTTP dates only go down to the second,
+    so a client revalidating with If-Modified-Since would miss a second
+    change made within the same second.
+    """
+    conditional_resources = ()
+
+    def get_conditional_resources(self):
+        return self.conditional_resources
+
+    def get(self, request, *args, **kwargs):
+        self.resource_versions = versions.current(self.get_conditional_resources())
+        etag = self.get_etag(request, self.resource_versions)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.add_etag(response, etag)
+
+    def get_etag(self, request, current):
+        """The ETag of the request's response, from versions.current()."""
+        token = ','.join(f'{resource}={version}' for resource, version in current.items())
+        return '"%s"' % hashlib.sha1(f'{request.get_full_path()}|{token}'.encode()).hexdigest()
+
+    def add_etag(self, response, etag):
+        if response.status_code in (200, HttpResponseNotModified.status_code):
+            response['ETag'] = etag
+            # Clients may keep the response but must revalidate before using it
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class HasRatedMixin:
+    """
+    For student list views: when a lecturer is given (see get_lecturer_id),
+    every student on the page carries has_rated, whether they rated that
+    lecturer, computed by one EXISTS subquery in the list query itself.
+    """
 
+    def get_lecturer_id(self):
+        return None
 
-class StudentListView(generics.ListAPIView):
-    """Admin can view all students"""
-    queryset = Student.objects.all()
+    def annotate_has_rated(self, queryset):
+        lecturer_id = self.get_lecturer_id()
+        if lecturer_id is None:
+            return queryset
+        return queryset.annotate(has_rated=Exists(
+            LecturerRating.objects.filter(student=OuterRef('pk'), lecturer_id=lecturer_id)
+        ))
+
+    def get_queryset(self):
+        return self.annotate_has_rated(super().get_queryset())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['lecturer_id'] = self.get_lecturer_id()
+        return context
+
+
+class StudentListView(ConditionalGetMixin, HasRatedMixin, generics.ListAPIView):
+    """
+    Admin can view all students, a page at a time in department and rank order.
+    Pass ?lecturer_id= to include whether each student has rated that lecturer.
+    """
+    queryset = Student.objects.select_related('user')
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('department', 'rank', 'id')
+
+    def get_lecturer_id(self):
+        try:
+            return int(self.request.query_params['lecturer_id'])
+        except (KeyError, ValueError):
+            return None
+
+    def get_conditional_resources(self):
+        if self.get_lecturer_id() is None:
+            return (versions.STUDENTS,)
+        return (versions.STUDENTS, versions.RATINGS)
 
-class StudentDetailView(generics.RetrieveAPIView):
+class StudentDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Students can view their profile"""
-    queryset = Student.objects.all()
+    queryset = Student.objects.select_related('user')
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
+    conditional_resources = (versions.STUDENTS,)
 
-class LecturerListView(generics.ListAPIView):
-    """Admin can view all lecturers"""
-    queryset = Lecturer.objects.all()
+class LecturerListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Admin can view all lecturers, a page at a time from the best rated down.
+    Pages are served from the response cache until a lecturer changes.
+    """
+    queryset = Lecturer.objects.select_related('user')
     serializer_class = LecturerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-average_rating', 'id')
+    conditional_resources = (versions.LECTURERS,)
 
-class LecturerDetailView(generics.RetrieveAPIView):
-    """Lecturers can view their profile"""
-    queryset = Lecturer.objects.all()
+    def list(self, request, *args, **kwargs):
+        def build():
+            return super(LecturerListView, self).list(request, *args, **kwargs).data
+        data = api_cache.cached(
+            api_cache.LECTURER_LIST,
+            api_cache.lecturer_list_key(request, self.resource_versions[versions.LECTURERS]),
+            build,
+        )
+        return Response(data)
+
+class LecturerDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    Lecturers can view their profile, served from the response cache until
+    that lecturer changes; ratings of other lecturers leave it cached.
+    """
+    queryset = Lecturer.objects.select_related('user')
     serializer_class = LecturerSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_conditional_resources(self):
+        return (versions.lecturer(self.kwargs['pk']),)
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            return super(LecturerDetailView, self).retrieve(request, *args, **kwargs).data
+        version = self.resource_versions[versions.lecturer(kwargs['pk'])]
+        data = api_cache.cached(
+            api_cache.LECTURER_DETAIL,
+            api_cache.lecturer_detail_key(kwargs['pk'], version),
+            build,
+        )
+        return Response(data)
+
 
 class LecturerRatingCreateView(generics.CreateAPIView):
     """Students can rate lecturers"""
@@ -48,66 +174,97 @@ class LecturerRatingCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         """Ensure the rating is tied to the logged-in student"""
-        serializer.save(student=self.request.user.student)
+        serializer.save(student=Student(pk=student_pk(self.request.user)))
 
-class LecturerRatingsView(generics.ListAPIView):
-    """View ratings for a specific lecturer"""
+class LecturerRatingsView(ConditionalGetMixin, generics.ListAPIView):
+    """View ratings for a specific lecturer, a page at a time in the order they were given"""
     serializer_class = LecturerRatingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+    conditional_resources = (versions.RATINGS,)
 
     def get_queryset(self):
         lecturer_id = self.kwargs['lecturer_id']
         return LecturerRating.objects.filter(lecturer_id=lecturer_id)
 
-class AssignmentListview(generics.ListAPIView):
-    queryset = Assignment.objects.all()
+class AssignmentListview(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Admin lists assignments with the student and lecturer nested in full.
+    Pass ?view=flat for one flat object per assignment instead, read with a
+    single values() query; use it for bulk reads of the whole table.
+    """
+    queryset = Assignment.objects.select_related('student__user', 'lecturer__user')
     serializer_class = AssignmentSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+    # Assignments show the student and lecturer as well
+    conditional_resources = (versions.ASSIGNMENTS, versions.STUDENTS, versions.LECTURERS)
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('view') != 'flat':
+            return super().list(request, *args, **kwargs)
+        rows = self.paginate_queryset(flat_assignment_rows(Assignment.objects.all()))
+        return self.get_paginated_response(flat_assignment_data(rows))
 
     
 
 class RoundRobinApiView(APIView):
+    """
+    Admin runs the assignment over every student.
+    Optional JSON body: {"strategy": "round_robin" | "optimal" | "stable"};
+    round-robin is the default. "optimal" respects lecturer capacities and
+    "stable" runs a stable match over the students' own lecturer ratings.
+    Add "by_department": true to solve each department separately, in
+    parallel worker processes, and "dry_run": true to preview the run: nothing
+    is written and the response lists every student that would move.
+    "only_unassigned": true places only students without an assignment,
+    carrying on from lecturers' current loads and leaving everyone else as is.
+    Returns a summary of the run rather than the assignments themselves;
+    use the assignments endpoint to read them.
+    """
     permission_classes = [IsAdminUser]
 
     def post(self, request):
-        # Get students sorted by rank (assuming lower rank number is better)
-        students = list(Student.objects.all().order_by('rank'))
-
-        # Get lecturers sorted by average rating (highest first)
-        lecturers = list(Lecturer.objects.annotate(avg_rating=Avg('ratings__rating')).order_by('-avg_rating'))
-
-        if not lecturers:
-            return Response({"error": "No lecturers available for assignment"}, status=400)
-
-        assignments = []
-        lecturer_count = len(lecturers)
-
-        for i, student in enumerate(students):
-            lecturer = lecturers[i % lecturer_count]  # Round-robin assignment
-            # Use update_or_create filtering by student only
-            assignment, created = Assignment.objects.update_or_create(
-                student=student,
-                defaults={'lecturer': lecturer}
-            )
-            assignments.append(assignment)
-
-        serializer = AssignmentSerializer(assignments, many=True)
-        return Response(serializer.data, status=201)
+        options = RunAssignmentsSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        try:
+            summary = run_assignments(**options.validated_data)
+        except AssignmentError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(summary, status=200 if options.validated_data['dry_run'] else 201)
 
 
-class StudentsAssignedToLecturerView(generics.ListAPIView):
-    """Returns all students assigned to a particular lecturer."""
+class StudentsAssignedToLecturerView(ConditionalGetMixin, HasRatedMixin, generics.ListAPIView):
+    """
+    Returns the students assigned to a particular lecturer, a page at a time
+    in department and rank order, each marked with whether they have rated
+    the lecturer. Follow the "next" link for the next page.
+    """
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('department', 'rank', 'id')
+    conditional_resources = (versions.ASSIGNMENTS, versions.STUDENTS, versions.RATINGS)
+
+    def get_lecturer_id(self):
+        return self.kwargs['lecturer_id']
 
     def get_queryset(self):
         lecturer_id = self.kwargs['lecturer_id']
-        return [assignment.student for assignment in Assignment.objects.filter(lecturer__id=lecturer_id)]
+        students = Student.objects.filter(student_assignments__lecturer_id=lecturer_id).select_related('user')
+        return self.annotate_has_rated(students)
 
     def list(self, request, *args, **kwargs):
-        students = self.get_queryset()
+        students = self.paginate_queryset(self.get_queryset())
         serializer = self.get_serializer(students, many=True)
-        return Response({"lecturer_id": self.kwargs['lecturer_id'], "students": serializer.data}, status=status.HTTP_200_OK)
+        return Response({
+            "lecturer_id": self.kwargs['lecturer_id'],
+            "students": serializer.data,
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+        }, status=status.HTTP_200_OK)
 
 
 class SupervisorAssignedToStudentView(generics.RetrieveAPIView):
@@ -117,7 +274,7 @@ class SupervisorAssignedToStudentView(generics.RetrieveAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         student_id = self.kwargs['student_id']
-        assignment = Assignment.objects.filter(student__id=student_id).first()
+        assignment = Assignment.objects.filter(student__id=student_id).select_related('lecturer__user').first()
         
         if assignment:
             supervisor = assignment.lecturer
@@ -143,7 +300,7 @@ class BulkLecturerRatingCreateView(generics.CreateAPIView):
 
     def post(self, request, *args, **kwargs):
         # Ensure the user is a student
-        if not hasattr(request.user, 'student'):
+        if student_pk(request.user) is None:
             return Response({"detail": "Only students can submit ratings."},
                             status=status.HTTP_403_FORBIDDEN)
         serializer = self.get_serializer(data=request.data)
@@ -156,6 +313,101 @@ class BulkLecturerRatingCreateView(generics.CreateAPIView):
 
 
 
+class AssignmentCsvExportView(APIView):
+    """
+    Admin downloads every assignment as CSV. The file is streamed as rows are
+    read from a single joined query, so memory use does not grow with it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return streaming_csv_response()
+
+
+class ExportAssignmentsView(APIView):
+    """
+    Admin can export assignments as Excel. The workbook is written row by row
+    into the response as assignments are read from a single joined query, so
+    the download starts at once and memory use does not grow with it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return streaming_xlsx_response()
+
+
+class CacheStatsView(APIView):
+    """Admin reads the response cache's hit and miss counters, per kind of response"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(api_cache.stats())
+
+
+class GpaImportView(APIView):
+    """
+    Admin bulk-loads student GPAs from a CSV or NDJSON request body.
+    CSV bodies are sent as text/csv with rows of matric_number,gpa;
+    NDJSON bodies as application/x-ndjson with one
+    {"matric_number": ..., "gpa": ...} object per line.
+    Ranks are recomputed once per affected department.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        fmt = format_for_content_type(request.content_type)
+        if fmt is None:
+            return Response({"detail": "Send text/csv or application/x-ndjson."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if request.stream is None:
+            return Response({"detail": "Request body is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = codecs.iterdecode(request.stream, 'utf-8')
+        try:
+            summary = import_gpas(parse_rows(lines, fmt))
+        except GpaImportError as e:
+            return Response({"detail": str(e), "error_count": e.error_count, "errors": e.errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({"detail": "Request body must be UTF-8."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+class UserImportView(APIView):
+    """
+    Admin bulk-registers users, such as a new intake of students, from a
+    CSV or NDJSON request body. CSV bodies (text/csv) start with a header
+    row naming the columns email, full_name, role, password, matric_number
+    and department; NDJSON bodies (application/x-ndjson) have one object
+    with those keys per line. Students need a matric number and department.
+    Nothing is created unless every row is valid. Passwords are hashed
+    serially and ranks recomputed once per department. Hashing runs within
+    the request, so a request may carry at most USER_IMPORT_MAX_ROWS users;
+    larger intakes go through the import_users management command.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        fmt = format_for_content_type(request.content_type)
+        if fmt is None:
+            return Response({"detail": "Send text/csv or application/x-ndjson."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if request.stream is None:
+            return Response({"detail": "Request body is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = codecs.iterdecode(request.stream, 'utf-8')
+        try:
+            summary = user_import.import_users(user_import.parse_rows(lines, fmt),
+                                               max_rows=settings.USER_IMPORT_MAX_ROWS)
+        except user_import.UserImportError as e:
+            return Response({"detail": str(e), "error_count": e.error_count, "errors": e.errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({"detail": "Request body must be UTF-8."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+
+
 
 # class RunRoundRobinAssignmentView(APIView):
 #     """Admin runs round-robin assignment algorithm"""
@@ -201,29 +453,3 @@ class BulkLecturerRatingCreateView(generics.CreateAPIView):
 #         if assignment:
 #             return Response(LecturerSerializer(assignment.lecturer).data)
 #         return Response({"message": "No supervisor assigned yet"}, status=404)
-
-# ✅ EXPORTING ASSIGNMENTS
-# class ExportAssignmentsView(APIView):
-#     """Admin can export assignments as Excel"""
-#     permission_classes = [IsAdminUser]
-
-#     def get(self, request, format=None):
-#         assignments = Assignment.objects.select_related('student', 'lecturer')
-#         data = [
-#             {
-#                 "Student": assignment.student.user.full_name,
-#                 "Matric Number": assignment.student.matric_number,
-#                 "Lecturer": assignment.lecturer.user.full_name,
-#                 "Assigned Round": assignment.assigned_round,
-#                 "Assigned Date": assignment.assigned_date.strftime('%Y-%m-%d')
-#             }
-#             for assignment in assignments
-#         ]
-
-#         df = pd.DataFrame(data)
-#         response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-#         response['Content-Disposition'] = 'attachment; filename="assignments.xlsx"'
-#         df.to_excel(response, index=False)
-
-#         return response
-
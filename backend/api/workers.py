@@ -0,0 +1,26 @@
+"""
+Worker process pools for CPU-bound work: department-partitioned assignment
+solves and password hashing during bulk user imports.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def worker_count(configured, jobs):
+    """
+    The number of worker processes for ``jobs`` pieces of work: the
+    ``configured`` setting, or one per CPU when it is 0, and never more
+    than there are jobs (nor fewer than one).
+    """
+    return max(1, min(jobs, configured or os.cpu_count() or 1))
+
+
+def process_pool(workers):
+    """
+    A ProcessPoolExecutor of ``workers`` processes. Each worker starts with
+    django.setup() so the pool also works where processes are spawned
+    rather than forked.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
@@ -61,6 +61,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Outermost, so it counts the queries of every other middleware too
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -135,8 +137,9 @@ USE_TZ = True
 AUTH_USER_MODEL = 'userauths.User'
 
 REST_FRAMEWORK = {
+    # Role checks read the token's claims; views that need the user row opt in to ProfileJWTAuthentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userauths.authentication.ClaimsJWTAuthentication',
     ),
 }
 
@@ -172,6 +175,54 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Cache for API responses. Cached responses are keyed by the version
+# counters in the database, so every process stops serving them after a
+# change; local memory is private to each process, though, so set CACHE_URL
+# to a redis:// URL (needs the redis package) to share them between workers.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'api',
+        }
+    }
+# Seconds a cached API response may be served before it is rebuilt anyway
+API_CACHE_TIMEOUT = config('API_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds the optimal assignment solver may spend before finishing greedily
+ASSIGNMENT_TIME_BUDGET = config('ASSIGNMENT_TIME_BUDGET', default=30, cast=float)
+# Worker processes for department-partitioned assignment runs; 0 means one per CPU
+ASSIGNMENT_WORKERS = config('ASSIGNMENT_WORKERS', default=0, cast=int)
+# Per-request SQL instrumentation (api.middleware): a log record on the
+# api.sql logger, raised to a warning above the limits below, and with
+# SQL_QUERY_HEADERS X-DB-Query-Count and X-DB-Query-Time-Ms response headers,
+# which tell every client how the database is queried and so are off in
+# production unless asked for
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', default=True, cast=bool)
+SQL_QUERY_HEADERS = config('SQL_QUERY_HEADERS', default=DEBUG, cast=bool)
+SQL_SLOW_STATEMENTS = config('SQL_SLOW_STATEMENTS', default=3, cast=int)
+SQL_WARN_QUERIES = config('SQL_WARN_QUERIES', default=20, cast=int)
+SQL_WARN_MS = config('SQL_WARN_MS', default=500, cast=float)
+
+# Where assignment PDF reports (api.reports) are stored. Keep it outside
+# MEDIA_ROOT: reports are only served through the authenticated admin view
+REPORT_ROOT = config('REPORT_ROOT', default=str(BASE_DIR / 'reports'))
+
+# Worker processes the import_users command hashes passwords with; 0 means
+# one per CPU. Import requests always hash in the request's own process
+USER_IMPORT_WORKERS = config('USER_IMPORT_WORKERS', default=0, cast=int)
+# Users one import request may create. Their passwords are hashed within the
+# request, so larger intakes go through the import_users command instead
+USER_IMPORT_MAX_ROWS = config('USER_IMPORT_MAX_ROWS', default=200, cast=int)
+
 JAZZMIN_SETTINGS = {
     "custom_css": "css/admin_custom.css",
     "site_title": "Student-Supervisor Assignment",
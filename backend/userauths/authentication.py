@@ -0,0 +1,109 @@
+"""
+JWT authentication that trusts the token's claims instead of loading the user.
+
+Access tokens issued at login (see MyTokenObtainPairSerializer) carry the
+user's role, name, staff flag and the ids of their student and lecturer
+profiles. ClaimsJWTAuthentication, the default authentication class,
+turns those signed claims into a ClaimsUser without touching the
+database, which is all the role checks in api.permissions need.
+
+Claims are as current as the token: a change of role, staff status or
+active flag takes effect when the user next logs in or refreshes. Views
+that read or change the user itself set ``authentication_classes`` to
+ProfileJWTAuthentication, which loads the user together with its student
+or lecturer profile in one query; permissions, views and serializers then
+share that instance. Tokens issued before the profile claims existed are
+authenticated the same way. Refreshing a token (MyTokenRefreshSerializer)
+re-reads the claims from the user.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+# Claims a token needs to be authenticated without a query
+REQUIRED_CLAIMS = ('role', 'is_staff', 'student_id', 'lecturer_id')
+
+
+def add_user_claims(token, user):
+    """Add the claims ClaimsUser is built from to ``token`` for ``user``."""
+    student_id, lecturer_id = get_user_model().objects.filter(pk=user.pk).values_list(
+        'student__id', 'lecturer__id'
+    ).get()
+    token['full_name'] = user.full_name
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+    token['student_id'] = student_id
+    token['lecturer_id'] = lecturer_id
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """Authenticated user backed by the claims of a validated access token."""
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def full_name(self):
+        return self.token.get('full_name', '')
+
+    @cached_property
+    def student_id(self):
+        return self.token['student_id']
+
+    @cached_property
+    def lecturer_id(self):
+        return self.token['lecturer_id']
+
+    def __str__(self):
+        return f"{self.full_name} - {self.role}"
+
+
+class ProfileUsers:
+    """
+    Stands in for the user model in JWTAuthentication.get_user(), which
+    reads users through ``user_model.objects``: here that is a queryset
+    that joins in both profiles.
+    """
+
+    def __init__(self, model):
+        self.objects = model.objects.select_related('student', 'lecturer')
+        self.DoesNotExist = model.DoesNotExist
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that loads the user with ``select_related`` on both
+    profiles, so ``user.student`` and ``user.lecturer`` (and a failed
+    ``hasattr`` on either) cost no further queries. Everything else about
+    finding and checking the user is simplejwt's own get_user().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_model = ProfileUsers(self.user_model)
+
+
+class ClaimsJWTAuthentication(ProfileJWTAuthentication):
+    """ProfileJWTAuthentication that builds a ClaimsUser from the token instead when it carries the claims."""
+
+    def get_user(self, validated_token):
+        if all(claim in validated_token for claim in REQUIRED_CLAIMS):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; only tokens without the claims reach the database."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if all(claim in validated_token for claim in REQUIRED_CLAIMS):
+            return ClaimsUser(validated_token), validated_token
+        return await sync_to_async(super().get_user)(validated_token), validated_token
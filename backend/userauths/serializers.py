@@ -2,9 +2,13 @@ from rest_framework import serializers
 
 from api.models import Lecturer, Student
 from api.serializers import LecturerSerializer, StudentSerializer
+from .authentication import add_user_claims
 from .models import User
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
@@ -26,10 +30,21 @@ class ChangePasswordSerializer(serializers.Serializer):
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
-        token = super().get_token(user)
-        token['full_name'] = user.full_name
-        token['role'] = user.role
-        return token
+        # Role and profile ids let ClaimsJWTAuthentication skip loading the user
+        return add_user_claims(super().get_token(user), user)
+
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        # Re-read the claims so role and staff changes reach the next access token
+        refresh = self.token_class(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken("Token contained no recognizable user identification")
+        user = User.objects.filter(pk=user_id, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed("User not found or inactive.", code='user_inactive')
+        attrs['refresh'] = str(add_user_claims(refresh, user))
+        return super().validate(attrs)
 
 class UserSerializer(serializers.ModelSerializer):
     # Include nested profiles; these will be None if not present.
@@ -74,7 +89,8 @@ class RegistrationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"matric_number": "Matriculation number is not allowed for lecturers"}
             )
-        # Optionally, you could also require that lecturers do not provide department
+        # Lecturers may give a department; by-department assignment runs match
+        # them with the students of that department
         return attrs
 
     def create(self, validated_data):
@@ -95,6 +111,8 @@ class RegistrationSerializer(serializers.ModelSerializer):
                 )
             validated_data['matric_number'] = matric_number
             validated_data['department'] = department
+        elif validated_data.get('role') == 'lecturer' and department:
+            validated_data['department'] = department
 
         user = User.objects.create_user(**validated_data)
         return user
@@ -1,3 +1,61 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-# Create your tests here.
+from .authentication import ProfileJWTAuthentication
+from .models import User
+
+
+class ProfileJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='student@example.com', full_name='Student', role='student',
+            matric_number='M0000001', department='Computer Science',
+        )
+        self.authentication = ProfileJWTAuthentication()
+
+    def token(self):
+        return self.authentication.get_validated_token(str(AccessToken.for_user(self.user)).encode())
+
+    def test_loads_the_profiles_in_the_same_query(self):
+        token = self.token()
+        with self.assertNumQueries(1):
+            user = self.authentication.get_user(token)
+            self.assertEqual(user.student.matric_number, 'M0000001')
+            self.assertFalse(hasattr(user, 'lecturer'))
+        self.assertEqual(user, self.user)
+
+    def test_rejects_inactive_and_missing_users(self):
+        token = self.token()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+
+class TokenRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='lecturer@example.com', full_name='Lecturer', role='lecturer')
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)})
+
+    def test_refreshes_the_access_token(self):
+        response = self.refresh(RefreshToken.for_user(self.user))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(AccessToken(response.json()['access'])['role'], 'lecturer')
+
+    def test_a_token_without_a_user_is_rejected(self):
+        response = self.refresh(RefreshToken())
+        self.assertEqual(response.status_code, 401, response.content)
+
+    def test_an_inactive_user_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.user.is_active = False
+        self.user.save()
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 401, response.content)
@@ -3,10 +3,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from django.contrib.auth import get_user_model
-from .serializers import ChangePasswordSerializer, MyTokenObtainPairSerializer, RegistrationSerializer, UserSerializer
+from .authentication import ProfileJWTAuthentication
+from .serializers import (
+    ChangePasswordSerializer, MyTokenObtainPairSerializer, MyTokenRefreshSerializer, RegistrationSerializer, UserSerializer
+)
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -19,6 +22,8 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     """
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    # Reads and updates the user row and its profile, not just the token's claims
+    authentication_classes = [ProfileJWTAuthentication]
 
     def get_object(self):
         # Return the currently authenticated user
@@ -32,8 +37,12 @@ class RegistrationView(generics.CreateAPIView):
 class LoginView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
+class RefreshView(TokenRefreshView):
+    serializer_class = MyTokenRefreshSerializer
+
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    authentication_classes = [ProfileJWTAuthentication]
     serializer_class = ChangePasswordSerializer
 
     @swagger_auto_schema(